@@ -91,6 +91,14 @@ function DataPage() {
         fetchCountries(query);
     };
     
+    // Top-stocks entries whose lookup failed carry only a symbol and one of these statuses.
+    const stockErrorMessages = {
+        rate_limited: 'Rate limit reached. Try again later.',
+        not_found: 'No data for this symbol.',
+        timeout: 'Timed out loading data.',
+        error: 'Data unavailable.',
+    };
+
     const fetchTopStocks = async () => {
         try {
             const response = await axios.get('http://127.0.0.1:5555/api/top-stocks');
@@ -330,10 +338,19 @@ function DataPage() {
                     <div className="top-stocks">
                         {topStocks.map((stock, index) => (
                             <div key={index} className="stock-tile">
-                                <h4>
-                                    {stock.Name} ({stock.symbol})
-                                </h4>
-                                <p>Market Cap: ${parseInt(stock.MarketCapitalization).toLocaleString()}</p>
+                                {stock.status === 'ok' ? (
+                                    <>
+                                        <h4>
+                                            {stock.Name} ({stock.symbol})
+                                        </h4>
+                                        <p>Market Cap: ${parseInt(stock.MarketCapitalization).toLocaleString()}</p>
+                                    </>
+                                ) : (
+                                    <>
+                                        <h4>{stock.symbol}</h4>
+                                        <p>{stockErrorMessages[stock.status] || stockErrorMessages.error}</p>
+                                    </>
+                                )}
                                 <button onClick={() => fetchApiData(stock.symbol)}>Fetch Data</button>
                                 {apiData[stock.symbol] && (
                                     <>
@@ -2,89 +2,348 @@
 
 import time
 import os
+import json
+import hashlib
+import threading
+import logging
 from dotenv import load_dotenv
 
-from flask import Flask, request, jsonify, session
-from config import db, api, migrate, CORS
+# Local modules read their settings at import time, so load .env first.
+load_dotenv()
+
+from flask import Flask, Response, request, jsonify, session
+from werkzeug.serving import is_running_from_reloader
+from sqlalchemy.exc import IntegrityError
+from config import db, api, migrate, CORS, database_config, configure_sqlite
 from models import Company, Category, User, Favorites
+from passwords import PasswordPoolBusy
+from search import search_companies
+import metrics
+import logs
+from logs import log_payload
+from cache import make_cache, cache_stats
+from fanout import FetchPool
+from singleflight import SingleFlight
+from refresh import BackgroundRefresher, PeriodicJob
+from jobs import JobQueue, WorkerPool, RetryableJobError, QUEUED, RUNNING, SUCCEEDED, FAILED
+from ratelimit import background_priority
+from symbols import SymbolIndex, download_listing
+from http_client import newsapi, alphavantage, worldbank, openai_api, upstream_stats, UpstreamStats, UpstreamError
 import bcrypt
 import requests
 import openai
 from openai import OpenAI
 
-load_dotenv()
+logs.configure_logging()
+# Named explicitly so records look the same when this file runs as __main__.
+logger = logging.getLogger("app")
+
 client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
 
 NEWS_API_KEY = os.getenv("NEWS_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
 
-news_cache = {}
 CACHE_TTL = 86400
+# How long past CACHE_TTL an entry may still be served while it is refreshed in the background.
+CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", CACHE_TTL))
+PREWARM_INTERVAL = int(os.getenv("PREWARM_INTERVAL", 0))
+TOP_STOCK_SYMBOLS = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA']
+MAX_TOP_STOCK_SYMBOLS = int(os.getenv("MAX_TOP_STOCK_SYMBOLS", 20))
+
+news_cache = make_cache(
+    "news",
+    default_ttl=CACHE_TTL,
+    max_entries=int(os.getenv("NEWS_CACHE_MAX_ENTRIES", 2048)),
+    max_bytes=int(os.getenv("NEWS_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    stale_ttl=CACHE_STALE_TTL,
+)
+financial_metrics_cache = make_cache(
+    "financial_metrics",
+    default_ttl=CACHE_TTL,
+    max_entries=int(os.getenv("METRICS_CACHE_MAX_ENTRIES", 1024)),
+    stale_ttl=CACHE_STALE_TTL,
+)
+# Whole indicator series change at most yearly, so they are kept for a week.
+world_bank_cache = make_cache(
+    "world_bank_indicators",
+    default_ttl=int(os.getenv("WORLD_BANK_CACHE_TTL", 7 * 86400)),
+    max_entries=int(os.getenv("WORLD_BANK_CACHE_MAX_ENTRIES", 64)),
+    max_bytes=int(os.getenv("WORLD_BANK_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    stale_ttl=CACHE_STALE_TTL,
+)
+catalog_cache = make_cache(
+    "catalog",
+    default_ttl=CACHE_TTL,
+    max_entries=int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", 512)),
+)
+
+# Remote SYMBOL_SEARCH answers for queries the local index missed, including empty ones.
+symbol_search_cache = make_cache(
+    "symbol_search",
+    default_ttl=CACHE_TTL,
+    max_entries=int(os.getenv("SYMBOL_SEARCH_CACHE_MAX_ENTRIES", 2048)),
+)
+
+# Per-user name and favorites, dropped explicitly whenever they change.
+profile_cache = make_cache(
+    "profiles",
+    default_ttl=int(os.getenv("PROFILE_CACHE_TTL", 3600)),
+    max_entries=int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", 10000)),
+)
+
+completion_cache = make_cache(
+    "completions",
+    default_ttl=int(os.getenv("COMPLETION_CACHE_TTL", 3600)),
+    max_entries=int(os.getenv("COMPLETION_CACHE_MAX_ENTRIES", 1000)),
+    max_bytes=int(os.getenv("COMPLETION_CACHE_MAX_BYTES", 16 * 1024 * 1024)),
+)
+
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", 10))
+WORLD_BANK_PAGE_SIZE = int(os.getenv("WORLD_BANK_PAGE_SIZE", 1000))
+WORLD_BANK_MAX_PER_PAGE = 20000
+fetch_pool = FetchPool(
+    max_in_flight=int(os.getenv("FETCH_MAX_IN_FLIGHT", 8)),
+    per_host_limit=int(os.getenv("FETCH_PER_HOST_LIMIT", 4)),
+)
+upstream_flight = SingleFlight()
+background_refresher = BackgroundRefresher(max_workers=int(os.getenv("REFRESH_WORKERS", 2)))
+
+SYMBOL_LISTING_PATH = os.getenv("SYMBOL_LISTING_PATH", "symbols.csv")
+SYMBOL_LISTING_REFRESH = int(os.getenv("SYMBOL_LISTING_REFRESH", 0))
+SYMBOL_SEARCH_LIMIT = 10
+symbol_index = SymbolIndex()
+if os.path.exists(SYMBOL_LISTING_PATH):
+    symbol_index.load_csv(SYMBOL_LISTING_PATH)
+
+# Each worker makes at most one OpenAI call at a time, so JOB_WORKERS bounds them per process.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+# Workers spend OpenAI calls, so importing this module (seed.py, flask db, benchmarks) does not
+# start them; `python app.py` and asgi.py do, any process starts them when it queues its first
+# job, and START_JOB_WORKERS=1 starts them at import so queued jobs are picked up right away.
+# The same flag and entry points start the cache prewarm and the symbol listing refresh.
+START_JOB_WORKERS = os.getenv("START_JOB_WORKERS", "0") == "1"
+# How long a finished analysis is handed back for the same user and inputs instead of a new one.
+JOB_RESULT_REUSE = int(os.getenv("JOB_RESULT_REUSE", 86400))
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", 30 * 86400))
+career_jobs = JobQueue(
+    os.getenv("JOBS_PATH", "jobs.db"),
+    lease_seconds=int(os.getenv("JOB_LEASE_SECONDS", 600)),
+    max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", 3)),
+)
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
+app.config.update(database_config())
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = 'mysecretkey'
 
 db.init_app(app)
+with app.app_context():
+    configure_sqlite(db.engine)
+    metrics.instrument_engine(db.engine)
+logs.init_app(app)
+metrics.init_app(app)
 migrate.init_app(app, db)
 api.init_app(app)
-CORS(app, supports_credentials=True, origins="http://localhost:3000")
+CORS_ORIGIN = "http://localhost:3000"
+CORS_EXPOSE_HEADERS = ["X-Next-Cursor", logs.REQUEST_ID_HEADER]
+CORS(app, supports_credentials=True, origins=CORS_ORIGIN, expose_headers=CORS_EXPOSE_HEADERS)
 
 
-def fetch_news_for_company(company_name, desired_article_count=5):
-    current_time = time.time()
-    if company_name in news_cache:
-        cached_data, timestamp = news_cache[company_name]
-        if current_time - timestamp < CACHE_TTL:
-            return [article for article in cached_data if article['title'] != '[Removed]'][:desired_article_count]
+def filter_articles(articles, desired_article_count):
+    return [article for article in articles if article['title'] != '[Removed]'][:desired_article_count]
+
+
+def fetch_news_from_api(company_name):
+    """Fetch and cache articles for ``company_name``; concurrent calls for one company share a request."""
+    return upstream_flight.do(("news", company_name), _request_news, company_name)
+
 
+NEWS_API_URL = "https://newsapi.org/v2/everything"
 
-    response = requests.get("https://newsapi.org/v2/everything", params={
+
+def news_params(company_name):
+    return {
         "q": company_name,
         "apiKey": NEWS_API_KEY,
         "language": "en",
         "sortBy": "relevancy",
         "pageSize": 10
-    })
+    }
 
+
+def store_news(company_name, response):
+    """Cache and return the articles in a NewsAPI ``response``; an error response yields no articles."""
     if response.status_code == 200:
         articles = response.json().get('articles', [])
-        news_cache[company_name] = (articles, current_time)
-        return [article for article in articles if article['title'] != '[Removed]'][:desired_article_count]
+        news_cache.set(company_name, articles)
+        return articles
     else:
         return []
-    
-import logging
 
-logging.basicConfig(level=logging.DEBUG)
 
-@app.route('/career-assistant', methods=['POST'])
-def career_assistant():
-    data = request.get_json()
-    logging.debug(f"Received data: {data}") 
-    
-    user_id = data.get('user_id')
-    
-    if not user_id:
-        logging.warning("User not logged in.")
-        return jsonify({"message": "User not logged in."}), 401
-    
-    
-    favorites = Favorites.query.filter_by(user_id=user_id).all()
-    logging.debug(f"Fetched favorites for user {user_id}: {favorites}")
-    
-    favorite_companies = [{"company_name": fav.company.name, 
-                           "link": fav.company.link, 
-                           "category": fav.company.category.name if fav.company.category else None,
-                           "id": fav.company.id} for fav in favorites]
-    
+def _request_news(company_name):
+    try:
+        response = newsapi.get(NEWS_API_URL, params=news_params(company_name))
+    except requests.exceptions.RequestException as e:
+        logger.error("Error fetching news for %s: %s", company_name, e)
+        return []
+
+    return store_news(company_name, response)
+
+
+def cached_news(company_name):
+    """Return cached articles for ``company_name``, or None on a miss.
+
+    A stale entry is returned as-is while a background refresh replaces it.
+    """
+    entry = news_cache.get_stale(company_name)
+    if entry is None:
+        return None
+    articles, fresh = entry
+    if not fresh:
+        background_refresher.refresh(("news", company_name), fetch_news_from_api, company_name)
+    return articles
+
+
+def fetch_news_for_company(company_name, desired_article_count=5):
+    cached_data = cached_news(company_name)
+    if cached_data is None:
+        cached_data = fetch_news_from_api(company_name)
+    return filter_articles(cached_data, desired_article_count)
+
+
+def cached_news_for(company_names):
+    """Split ``company_names`` into ``({name: cached articles or None}, [names to fetch])``."""
+    articles_by_name = {}
+    misses = []
+    for name in company_names:
+        if name in articles_by_name:
+            continue
+        cached_data = cached_news(name)
+        if cached_data is None:
+            articles_by_name[name] = None
+            misses.append(name)
+        else:
+            articles_by_name[name] = cached_data
+    return articles_by_name, misses
+
+
+def fetch_news_for_companies(company_names, desired_article_count=5):
+    """Fetch news for several companies, calling NewsAPI concurrently for cache misses.
+
+    Results keep the order of ``company_names``; a company whose fetch fails or
+    exceeds ``FETCH_TIMEOUT`` gets an empty list instead of failing the request.
+    """
+    articles_by_name, misses = cached_news_for(company_names)
+    fetched = fetch_pool.map(fetch_news_from_api, misses, host="newsapi.org",
+                             timeout=FETCH_TIMEOUT, default=[])
+    articles_by_name.update(zip(misses, fetched))
+
+    return [filter_articles(articles_by_name[name], desired_article_count) for name in company_names]
+
+
+def profile_snapshot(user_id):
+    """Return the cached ``{"name", "favorites", "etag"}`` snapshot for ``user_id``, or None if there is no such user.
+
+    Callers that change a user's name or favorites, or a favorited company,
+    must call ``invalidate_profiles`` after committing.
+    """
+    key = profile_key(user_id)
+    if key is None:
+        return None
+    snapshot = profile_cache.get(key)
+    if snapshot is not None:
+        return snapshot
+
+    version = _profile_versions.get(key, 0)
+    user = User.with_favorites(int(key))
+    if not user:
+        return None
+    snapshot = {
+        "name": user.name,
+        "favorites": [{
+            "id": favorite.company.id,
+            "company_name": favorite.company.name,
+            "link": favorite.company.link,
+            "indeed": favorite.company.indeed,
+            "category": favorite.company.category.name if favorite.company.category else None
+        } for favorite in sorted(user.favorites, key=lambda favorite: favorite.id) if favorite.company],
+    }
+    snapshot["etag"] = hashlib.sha256(json.dumps(snapshot, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+    with _profile_versions_lock:
+        # If the user was invalidated while we read it, the rows may predate that commit.
+        if _profile_versions.get(key, 0) == version:
+            profile_cache.set(key, snapshot)
+    return snapshot
+
+
+# Bumped by every invalidation in this process, so a snapshot read before it is not cached after it.
+_profile_versions = {}
+_profile_versions_lock = threading.Lock()
+
+
+def profile_key(user_id):
+    """Cache key for ``user_id`` as sent in a query string or body ("01", " 1" and 1 are the same user)."""
+    try:
+        return str(int(user_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def invalidate_profiles(user_ids):
+    keys = {profile_key(user_id) for user_id in user_ids} - {None}
+    with _profile_versions_lock:
+        for key in keys:
+            _profile_versions[key] = _profile_versions.get(key, 0) + 1
+            profile_cache.delete(key)
+
+
+def users_favoriting(company_ids):
+    """Return the ids of users who have favorited any of ``company_ids``."""
+    company_ids = list(company_ids)
+    if not company_ids:
+        return []
+    return [user_id for (user_id,) in
+            db.session.query(Favorites.user_id).filter(Favorites.company_id.in_(company_ids)).distinct()]
+
+
+def conditional_json(payload, etag):
+    """JSON response carrying ``etag``; becomes a 304 when it matches ``If-None-Match``."""
+    response = jsonify(payload)
+    response.set_etag(etag)
+    # Let browsers keep the body but revalidate it on every use.
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+
+OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
+openai_ttft_stats = UpstreamStats()
+
+
+def build_career_prompt(user_id, data):
+    """Build the career-analysis prompt from the user's favorites, their news and the form options."""
+    snapshot = profile_snapshot(user_id)
+    favorite_companies = snapshot["favorites"] if snapshot else []
+    articles_per_company = fetch_news_for_companies(
+        [company['company_name'] for company in favorite_companies], desired_article_count=3
+    )
+    reports = None
+    selected_report = data.get('selectedReport', '')
+    if selected_report:
+        try:
+            reports = search_world_bank_catalog(selected_report)
+        except Exception as e:
+            logger.error("Error searching World Bank catalog for %r: %s", selected_report, e)
+    return format_career_prompt(user_id, data, favorite_companies, articles_per_company, reports)
+
+
+def format_career_prompt(user_id, data, favorite_companies, articles_per_company, reports=None):
+    """Render the prompt from fetched inputs; ``reports`` is None when the catalog search failed."""
+    log_payload(logger, "Favorites for user %s: %s", user_id, favorite_companies)
     
     news_details = []
-    for company in favorite_companies:
-        articles = fetch_news_for_company(company['company_name'], desired_article_count=3)
-        logging.debug(f"Fetched articles for company {company['company_name']}: {articles}")
+    for company, articles in zip(favorite_companies, articles_per_company):
         news_details.append({
             "company_name": company['company_name'],
             "news_articles": [{"title": article['title'], "url": article['url']} for article in articles]
@@ -102,11 +361,7 @@ def career_assistant():
 
     
     
-    logging.debug(f"Generated AI prompt: {favorites_prompt}")
-    
-    
     career_question = data.get('prompt', '')  
-    logging.debug(f"Career Question: {career_question}")
     
     
     prompt = f"Provide a personalized career analysis based on the following preferences:\n"
@@ -152,12 +407,8 @@ def career_assistant():
         prompt += f"Consider the company: {selected_company}. "
     if selected_region:
         prompt += f"Focus on the region: {selected_region}. "
-    if selected_report:        
-        response = requests.get(f"http://localhost:5555/api/search?q={selected_report}")
-        if response.status_code == 200:
-            data = response.json()
-            reports = data.get('data', [])
-            
+    if selected_report:
+        if reports is not None:
             selected_report_normalized = selected_report.strip().lower()
             
             matching_report = next(
@@ -178,190 +429,716 @@ def career_assistant():
         else:
             prompt += "Failed to retrieve report data.\n"
     
-    logging.debug(f"Final AI prompt: {prompt}")
+    log_payload(logger, "Career prompt for user %s: %s", user_id, prompt)
+    return prompt
+
+
+def openai_headers():
+    return {"Content-Type": "application/json", "Authorization": f"Bearer {OPENAI_API_KEY}"}
+
 
-    api_data = {
+def completion_cache_key(api_data):
+    """Content address of a chat completion: model, temperature and whitespace-normalized messages."""
+    normalized = {
+        "model": api_data["model"],
+        "temperature": api_data["temperature"],
+        "messages": [
+            {"role": message["role"], "content": " ".join(message["content"].split())}
+            for message in api_data["messages"]
+        ],
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def request_career_analysis(api_data, use_cache=True):
+    """Return the completion text for ``api_data``; raises ``requests.exceptions.RequestException``.
+
+    Identical requests are answered from ``completion_cache`` unless ``use_cache`` is False.
+    """
+    cache_key = completion_cache_key(api_data)
+    if use_cache:
+        cached_response = completion_cache.get(cache_key)
+        if cached_response is not None:
+            return cached_response
+
+    response = openai_api.post(OPENAI_CHAT_URL, headers=openai_headers(), json=api_data)
+    response.raise_for_status()
+    return store_completion(cache_key, response.json())
+
+
+def career_completion_request(prompt):
+    return {
         "model": "gpt-4o-mini",
         "messages": [{"role": "user", "content": prompt}],
         "temperature": 0.7
     }
 
+
+def store_completion(cache_key, api_response):
+    """Cache and return the answer text of a chat completion response body."""
+    log_payload(logger, "OpenAI response: %s", api_response)
+
+    ai_response = api_response['choices'][0]['message']['content'].strip()
+    completion_cache.set(cache_key, ai_response)
+    return ai_response
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+class OpenAIStreamError(Exception):
+    """OpenAI reported an error in the middle of a stream, or the stream ended before ``[DONE]``."""
+
+
+def stream_delta(line):
+    """Text carried by one line of an OpenAI stream: "" if none, None once the stream is done.
+
+    Raises ``OpenAIStreamError`` for an error chunk.
+    """
+    if not line or not line.startswith("data: "):
+        return ""
+    payload = line[len("data: "):]
+    if payload == "[DONE]":
+        return None
     try:
-        response = requests.post("https://api.openai.com/v1/chat/completions", 
-                                 headers={"Content-Type": "application/json", 
-                                          "Authorization": f"Bearer {OPENAI_API_KEY}"}, 
-                                 json=api_data)
-        response.raise_for_status()
-        
-        
-        api_response = response.json()
-        logging.debug(f"API response: {api_response}")
-        
-        ai_response = api_response['choices'][0]['message']['content'].strip()
+        chunk = json.loads(payload)
+        if isinstance(chunk, dict) and chunk.get("error"):
+            error = chunk["error"]
+            raise OpenAIStreamError(error.get("message", str(error)) if isinstance(error, dict) else str(error))
+        choices = chunk.get("choices") or [{}]
+        return choices[0].get("delta", {}).get("content") or ""
+    except (ValueError, AttributeError):
+        # A malformed chunk is skipped rather than ending the stream without a done or error event.
+        logger.warning("Skipping malformed OpenAI stream chunk: %.200s", payload)
+        return ""
+
+
+def stream_career_analysis(api_data, use_cache=True):
+    """Forward completion tokens to the client as Server-Sent Events as OpenAI produces them.
+
+    Each event carries ``{"delta": text}``; the stream ends with a ``done`` event, or an
+    ``error`` event if the upstream stream breaks. If the client disconnects, the
+    generator is closed and the upstream response with it. A cached completion is
+    sent as a single delta, and a fully streamed one is added to the cache.
+    """
+    cache_key = completion_cache_key(api_data)
+    cached_response = completion_cache.get(cache_key) if use_cache else None
+    if cached_response is not None:
+        body = sse_event({"delta": cached_response}) + sse_event({}, "done")
+        return Response(body, mimetype="text/event-stream", headers=SSE_HEADERS)
+
+    started = time.perf_counter()
+    try:
+        upstream = openai_api.post(OPENAI_CHAT_URL, headers=openai_headers(),
+                                   json={**api_data, "stream": True}, stream=True)
+        upstream.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        logger.error("Error during OpenAI request: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+    def events():
+        first_token = True
+        parts = []
+        try:
+            for line in upstream.iter_lines(chunk_size=None, decode_unicode=True):
+                delta = stream_delta(line)
+                if delta is None:
+                    break
+                if not delta:
+                    continue
+                if first_token:
+                    first_token = False
+                    openai_ttft_stats.record(time.perf_counter() - started)
+                parts.append(delta)
+                yield sse_event({"delta": delta})
+            else:
+                # Only a stream that reached [DONE] is complete enough to cache.
+                raise OpenAIStreamError("OpenAI stream ended before completion")
+            completion_cache.set(cache_key, "".join(parts).strip())
+            yield sse_event({}, "done")
+        except (requests.exceptions.RequestException, OpenAIStreamError) as e:
+            logger.error("OpenAI stream failed: %s", e)
+            yield sse_event({"error": str(e)}, "error")
+        finally:
+            upstream.close()
+
+    return Response(events(), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+
+def bool_field(data, name, default):
+    """Boolean field ``name`` of a JSON body, or ``default`` if it is absent.
+
+    Raises ValueError with the message for the client if the value is not a JSON
+    boolean, so a string such as ``"false"`` is not taken as true.
+    """
+    value = data.get(name, default)
+    if not isinstance(value, bool):
+        raise ValueError(f"{name} must be true or false")
+    return value
+
+
+@app.route('/career-assistant', methods=['POST'])
+def career_assistant():
+    data = request.get_json()
+    
+    user_id = data.get('user_id')
+    
+    if not user_id:
+        logger.warning("Career assistant called without a user")
+        return jsonify({"message": "User not logged in."}), 401
+
+    try:
+        use_cache = bool_field(data, 'cache', True)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if use_cache and not data.get('stream'):
+        finished = finished_career_analysis(user_id, data)
+        if finished is not None:
+            return jsonify({"response": finished}), 200
+
+    api_data = career_completion_request(build_career_prompt(user_id, data))
+
+    if data.get('stream'):
+        return stream_career_analysis(api_data, use_cache=use_cache)
+
+    try:
+        ai_response = request_career_analysis(api_data, use_cache=use_cache)
         return jsonify({"response": ai_response}), 200
     except requests.exceptions.RequestException as e:
-        logging.error(f"Error during OpenAI request: {e}")
+        logger.error("Error during OpenAI request: %s", e)
         return jsonify({"error": str(e)}), 500
 
+
+CAREER_JOB = "career_analysis"
+
+
+def career_job_key(user_id, data):
+    """Jobs for the same user, favorites and form inputs share this key."""
+    snapshot = profile_snapshot(user_id)
+    options = {key: value for key, value in data.items() if key not in ("user_id", "cache", "stream")}
+    key = [str(user_id), snapshot["etag"] if snapshot else None, options]
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def finished_career_analysis(user_id, data):
+    """Response of a job that analysed the same inputs within ``JOB_RESULT_REUSE``, or None."""
+    job = career_jobs.find(CAREER_JOB, career_job_key(user_id, data), JOB_RESULT_REUSE)
+    if job is None or job["status"] != SUCCEEDED:
+        return None
+    return job["result"]["response"]
+
+
+def run_career_job(payload):
+    """Job handler: the same analysis ``/career-assistant`` answers inline."""
+    data = payload["data"]
+    with app.app_context():
+        api_data = career_completion_request(build_career_prompt(payload["user_id"], data))
+    try:
+        return {"response": request_career_analysis(api_data, use_cache=data.get('cache', True))}
+    except requests.exceptions.HTTPError as e:
+        status = e.response.status_code if e.response is not None else 500
+        if status < 500 and status != 429:
+            raise
+        raise RetryableJobError(str(e)) from e
+    except requests.exceptions.RequestException as e:
+        raise RetryableJobError(str(e)) from e
+
+
+def career_job_view(job):
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "prompt": job["payload"]["data"].get("prompt", ""),
+        "response": job["result"]["response"] if job["status"] == SUCCEEDED else None,
+        "error": job["error"] if job["status"] == FAILED else None,
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
+
+
+job_workers = WorkerPool(career_jobs, {CAREER_JOB: run_career_job}, workers=JOB_WORKERS)
+
+
+@app.route('/career-assistant/jobs', methods=['GET', 'POST'])
+def career_assistant_jobs():
+    if request.method == 'GET':
+        user_id = request.args.get('user_id')
+        if not user_id:
+            return jsonify({"message": "User ID is required"}), 400
+        limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+        return jsonify([career_job_view(job) for job in career_jobs.for_user(str(user_id), limit)]), 200
+
+    data = request.get_json()
+    user_id = data.get('user_id')
+    if not user_id:
+        logger.warning("Career assistant job submitted without a user")
+        return jsonify({"message": "User not logged in."}), 401
+    try:
+        use_cache = bool_field(data, 'cache', True)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    job, created = career_jobs.enqueue(
+        CAREER_JOB,
+        {"user_id": user_id, "data": data},
+        user_id=str(user_id),
+        dedupe_key=career_job_key(user_id, data),
+        reuse_within=JOB_RESULT_REUSE if use_cache else None,
+    )
+    if created:
+        # Under servers that never call start_job_workers() (flask run, gunicorn without
+        # START_JOB_WORKERS) the first job submitted starts this process's workers.
+        start_job_workers()
+        job_workers.notify()
+    response = jsonify(career_job_view(job))
+    response.status_code = 202 if job["status"] in (QUEUED, RUNNING) else 200
+    response.headers["Location"] = f"/career-assistant/jobs/{job['id']}"
+    return response
+
+
+@app.route('/career-assistant/jobs/<job_id>', methods=['GET'])
+def get_career_job(job_id):
+    job = career_jobs.get(job_id)
+    if job is None or job["kind"] != CAREER_JOB:
+        return jsonify({"message": "Job not found."}), 404
+    return jsonify(career_job_view(job)), 200
+
+def compact_indicator(records):
+    """Convert World Bank indicator records into parallel ``country``/``date``/``value`` columns.
+
+    Rows without a value are dropped; country and indicator names are kept once
+    in lookup tables instead of on every row.
+    """
+    compact = {"indicator": None, "countries": {}, "country": [], "date": [], "value": []}
+    for record in records:
+        if record.get("value") is None:
+            continue
+        code = record.get("countryiso3code") or record["country"]["id"]
+        if compact["indicator"] is None:
+            compact["indicator"] = {"id": record["indicator"]["id"], "name": record["indicator"]["value"]}
+        compact["countries"].setdefault(code, record["country"]["value"])
+        compact["country"].append(code)
+        date = record["date"]
+        compact["date"].append(int(date) if date.isdigit() else date)
+        compact["value"].append(record["value"])
+    return compact
+
+
+def fetch_world_bank_indicator(indicator):
+    """Return the compact series for ``indicator`` for every country and year.
+
+    Served from cache when possible, refreshing stale entries in the background.
+    Raises ``UpstreamError`` if the series cannot be fetched.
+    """
+    entry = world_bank_cache.get_stale(indicator)
+    if entry is not None:
+        compact, fresh = entry
+        if not fresh:
+            background_refresher.refresh(("world_bank", indicator), refresh_world_bank_indicator, indicator)
+        return compact
+
+    return refresh_world_bank_indicator(indicator)
+
+
+def refresh_world_bank_indicator(indicator):
+    return upstream_flight.do(("world_bank", indicator), _request_world_bank_indicator, indicator)
+
+
+def world_bank_indicator_url(indicator):
+    return f"https://api.worldbank.org/v2/country/all/indicator/{indicator}"
+
+
+def world_bank_page_params(page):
+    return {"format": "json", "per_page": WORLD_BANK_PAGE_SIZE, "page": page}
+
+
+def _request_world_bank_page(indicator, page):
+    try:
+        response = worldbank.get(world_bank_indicator_url(indicator), params=world_bank_page_params(page))
+    except requests.exceptions.RequestException as e:
+        logger.error("Error fetching World Bank data for %s: %s", indicator, e)
+        raise UpstreamError(str(e))
+    return parse_world_bank_page(indicator, response)
+
+
+def parse_world_bank_page(indicator, response):
+    """Return ``(meta, records)`` from one indicator page; raises ``UpstreamError``."""
+    if response.status_code != 200:
+        raise UpstreamError(f"World Bank returned {response.status_code}")
+
+    data = response.json()
+    # Unknown indicators come back as a 200 holding only an error message.
+    if len(data) < 2:
+        message = data[0].get("message", [{}])[0].get("value") if data and isinstance(data[0], dict) else None
+        raise UpstreamError(message or f"No data found for indicator {indicator}", status="not_found")
+    return data[0], data[1] or []
+
+
+def _request_world_bank_indicator(indicator):
+    meta, records = _request_world_bank_page(indicator, 1)
+    remaining = list(range(2, int(meta.get("pages", 1)) + 1))
+    pages = fetch_pool.map(lambda page: _request_world_bank_page(indicator, page), remaining,
+                           host="api.worldbank.org", timeout=FETCH_TIMEOUT, default=None)
+    if any(page is None for page in pages):
+        raise UpstreamError(f"Timed out fetching World Bank data for {indicator}")
+    for _, page_records in pages:
+        records.extend(page_records)
+    return store_world_bank_indicator(indicator, records)
+
+
+def store_world_bank_indicator(indicator, records):
+    """Cache and return the compact series built from every page of ``indicator``."""
+    if not records:
+        raise UpstreamError(f"No data found for indicator {indicator}", status="not_found")
+    compact = compact_indicator(records)
+    world_bank_cache.set(indicator, compact)
+    return compact
+
+
+def parse_year_range(value):
+    """Parse ``YYYY`` or ``START:END`` (either side optional) into an inclusive ``(start, end)``."""
+    if not value:
+        return None, None
+    start, separator, end = value.partition(":")
+    start = int(start) if start else None
+    if not separator:
+        return start, start
+    return start, int(end) if end else None
+
+
+def filter_indicator(compact, countries=None, start=None, end=None):
+    """Return the row positions of ``compact`` matching the country codes and inclusive year range."""
+    positions = []
+    for position, (code, date) in enumerate(zip(compact["country"], compact["date"])):
+        if countries and code not in countries:
+            continue
+        year = date if isinstance(date, int) else int(date[:4])
+        if (start is not None and year < start) or (end is not None and year > end):
+            continue
+        positions.append(position)
+    return positions
+
+
 @app.route("/api/world-bank", methods=["GET"])
 def get_world_bank_data():
-    indicator = request.args.get("indicator", "SP.POP.TOTL")
-    url = f"http://api.worldbank.org/v2/country/all/indicator/{indicator}?format=json"
-    response = requests.get(url)
+    """Serve an indicator as compact columns, filtered by ``country``, ``date`` and paged by ``per_page``/``page``.
 
-    if response.status_code != 200:
+    ``country`` is a comma-separated list of ISO3 codes and ``date`` a year or
+    ``start:end`` range, as in the World Bank API.
+    """
+    try:
+        query = world_bank_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        compact = fetch_world_bank_indicator(query["indicator"])
+    except UpstreamError as e:
+        if e.status == "not_found":
+            return jsonify({"error": str(e)}), 404
         return jsonify({"error": "Failed to fetch World Bank data"}), 500
 
-    data = response.json()
+    return jsonify(world_bank_page(compact, query))
 
-    if len(data) < 2 or not data[1]:
-        return jsonify({"error": f"No data found for indicator {indicator}"}), 500
 
-    return jsonify(data)
+def world_bank_query(args):
+    """Parse the ``/api/world-bank`` query arguments; raises ``ValueError`` with a message for the client."""
+    indicator = args.get("indicator", "SP.POP.TOTL").strip().upper()
+    countries = {code.strip().upper() for code in args.get("country", "").split(",") if code.strip()}
+    per_page = args.get("per_page", WORLD_BANK_MAX_PER_PAGE, type=int)
+    page = args.get("page", 1, type=int)
+    try:
+        start, end = parse_year_range(args.get("date", ""))
+    except ValueError:
+        raise ValueError("date must be a year or a start:end range of years")
+    if not 1 <= per_page <= WORLD_BANK_MAX_PER_PAGE:
+        raise ValueError(f"per_page must be between 1 and {WORLD_BANK_MAX_PER_PAGE}")
+    if page < 1:
+        raise ValueError("page must be at least 1")
+    return {"indicator": indicator, "countries": countries, "start": start, "end": end,
+            "per_page": per_page, "page": page}
+
+
+def world_bank_page(compact, query):
+    """Filter ``compact`` by a ``world_bank_query`` and return the requested page of columns."""
+    per_page, page = query["per_page"], query["page"]
+    positions = filter_indicator(compact, query["countries"], query["start"], query["end"])
+    selected = positions[(page - 1) * per_page:page * per_page]
+    country = [compact["country"][position] for position in selected]
+    return {
+        "indicator": compact["indicator"],
+        "page": page,
+        "pages": -(-len(positions) // per_page),
+        "per_page": per_page,
+        "total": len(positions),
+        "countries": {code: compact["countries"][code] for code in dict.fromkeys(country)},
+        "country": country,
+        "date": [compact["date"][position] for position in selected],
+        "value": [compact["value"][position] for position in selected],
+    }
 
+def fetch_financial_metrics(company_symbol):
+    """Return OVERVIEW metrics for ``company_symbol`` from cache or Alpha Vantage.
 
-financial_metrics_cache = {}
+    Concurrent cache misses for the same symbol share one upstream call; stale
+    entries are served while a background refresh replaces them. Raises
+    ``UpstreamError`` if the metrics cannot be fetched.
+    """
+    entry = financial_metrics_cache.get_stale(company_symbol)
+    if entry is not None:
+        metrics_data, fresh = entry
+        if not fresh:
+            background_refresher.refresh(("metrics", company_symbol), refresh_financial_metrics, company_symbol)
+        return metrics_data
 
-@app.route('/financial-metrics/<string:company_symbol>', methods=['GET'])
-def get_financial_metrics(company_symbol):
-    current_time = time.time()
-    
-    
-    if company_symbol in financial_metrics_cache:
-        cached_data, timestamp = financial_metrics_cache[company_symbol]
-        if current_time - timestamp < CACHE_TTL:
-            return jsonify(cached_data), 200
-    
-    
-    response = requests.get("https://www.alphavantage.co/query", params={
+    return refresh_financial_metrics(company_symbol)
+
+
+def refresh_financial_metrics(company_symbol):
+    return upstream_flight.do(("metrics", company_symbol), _request_financial_metrics, company_symbol)
+
+
+ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
+
+
+def financial_metrics_params(company_symbol):
+    return {
         "function": "OVERVIEW",
         "symbol": company_symbol,
         "apikey": ALPHA_VANTAGE_API_KEY
-    })
+    }
 
-    if response.status_code == 200:
-        metrics_data = response.json()
-        
-        
-        financial_metrics_cache[company_symbol] = (metrics_data, current_time)
-        
-        return jsonify(metrics_data), 200
-    else:
-        return jsonify({"error": "Failed to fetch financial metrics"}), 500
+
+def _request_financial_metrics(company_symbol):
+    try:
+        response = alphavantage.get(ALPHA_VANTAGE_URL, params=financial_metrics_params(company_symbol))
+    except requests.exceptions.RequestException as e:
+        logger.error("Error fetching financial metrics for %s: %s", company_symbol, e)
+        raise UpstreamError(str(e), status=getattr(e, "status", "error"))
+    return store_financial_metrics(company_symbol, response)
+
+
+def store_financial_metrics(company_symbol, response):
+    """Cache and return the OVERVIEW metrics in ``response``; raises ``UpstreamError``."""
+    if response.status_code != 200:
+        raise UpstreamError(f"Alpha Vantage returned {response.status_code}",
+                            status="rate_limited" if response.status_code == 429 else "error")
+
+    metrics_data = response.json()
+    # Alpha Vantage reports throttling as a 200 with only a "Note" or "Information" message.
+    if "Symbol" not in metrics_data and ("Note" in metrics_data or "Information" in metrics_data):
+        raise UpstreamError(metrics_data.get("Note") or metrics_data.get("Information"), status="rate_limited")
+
+    financial_metrics_cache.set(company_symbol, metrics_data)
+    return metrics_data
+
+
+@app.route('/financial-metrics/<string:company_symbol>', methods=['GET'])
+def get_financial_metrics(company_symbol):
+    try:
+        metrics_data = fetch_financial_metrics(company_symbol)
+    except UpstreamError as e:
+        status_code = 429 if e.status == "rate_limited" else 500
+        return jsonify({"error": "Failed to fetch financial metrics"}), status_code
+    return jsonify(metrics_data), 200
+
+
+def top_stock_entry(symbol):
+    try:
+        stock_data = fetch_financial_metrics(symbol)
+    except UpstreamError as e:
+        return {"symbol": symbol, "status": e.status, "error": str(e)}
+    return {**stock_data, "symbol": symbol, "status": "ok"}
 
 
 @app.route('/api/top-stocks', methods=['GET'])
 def get_top_stocks():
-    top_stocks_symbols = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA']
-    
-    stocks_data = []
-    
-    for symbol in top_stocks_symbols:
-        response = requests.get("https://www.alphavantage.co/query", params={
-            "function": "OVERVIEW",
-            "symbol": symbol,
-            "apikey": ALPHA_VANTAGE_API_KEY
-        })
+    symbols = requested_symbols(request.args.get('symbols'))
+    if len(symbols) > MAX_TOP_STOCK_SYMBOLS:
+        return jsonify({"error": f"At most {MAX_TOP_STOCK_SYMBOLS} symbols can be requested"}), 400
+
+    results = fetch_pool.map(top_stock_entry, symbols, host="www.alphavantage.co",
+                             timeout=FETCH_TIMEOUT, default=None)
+    return jsonify(top_stocks(symbols, results)), 200
+
+
+def requested_symbols(symbols):
+    """Deduplicated, upper-cased symbols from a comma-separated list, or ``TOP_STOCK_SYMBOLS``."""
+    if symbols:
+        return list(dict.fromkeys(symbol.strip().upper() for symbol in symbols.split(',') if symbol.strip()))
+    return TOP_STOCK_SYMBOLS
 
-        if response.status_code == 200:
-            stock_data = response.json()
-            stock_data['symbol'] = symbol
-            stocks_data.append(stock_data)
-    
-    return jsonify(stocks_data), 200
+
+def top_stocks(symbols, results):
+    return [
+        result if result is not None else {"symbol": symbol, "status": "timeout"}
+        for symbol, result in zip(symbols, results)
+    ]
+
+def remote_symbol_search(keywords):
+    """Look ``keywords`` up with Alpha Vantage SYMBOL_SEARCH and add the matches to the local index."""
+    cache_key = keywords.strip().lower()
+    cached = symbol_search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        response = alphavantage.get(
+            'https://www.alphavantage.co/query',
+            params={
+                'function': 'SYMBOL_SEARCH',
+                'keywords': keywords,
+                'apikey': ALPHA_VANTAGE_API_KEY
+            }
+        )
+    except requests.exceptions.RequestException as e:
+        raise UpstreamError(str(e), status=getattr(e, "status", "error"))
+
+    if response.status_code != 200:
+        raise UpstreamError(f"Alpha Vantage returned {response.status_code}",
+                            status="rate_limited" if response.status_code == 429 else "error")
+
+    data = response.json()
+    if 'bestMatches' not in data:
+        if 'Note' in data or 'Information' in data:
+            raise UpstreamError(data.get('Note') or data.get('Information'), status="rate_limited")
+        raise UpstreamError("Unexpected SYMBOL_SEARCH response")
+
+    matches = [
+        {'symbol': match['1. symbol'], 'name': match['2. name']}
+        for match in data['bestMatches']
+    ]
+    for match in matches:
+        symbol_index.add(match['symbol'], match['name'])
+    symbol_search_cache.set(cache_key, matches)
+    return matches
 
 @app.route('/symbol-search', methods=['GET'])
 def symbol_search():
     company_name = request.args.get('company_name')
     if company_name:
+        local_matches = symbol_index.search(company_name, limit=SYMBOL_SEARCH_LIMIT)
+        # Without a loaded listing the index only holds symbols learned from earlier
+        # remote searches, so a short local answer may be missing better matches.
+        if local_matches and (symbol_index.listing_loaded or len(local_matches) >= SYMBOL_SEARCH_LIMIT):
+            return jsonify(local_matches), 200
         try:
-            response = requests.get(
-                'https://www.alphavantage.co/query',
-                params={
-                    'function': 'SYMBOL_SEARCH',
-                    'keywords': company_name,
-                    'apikey': ALPHA_VANTAGE_API_KEY
-                }
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                if 'bestMatches' in data and data['bestMatches']:
-                    
-                    matches = [
-                        {'symbol': match['1. symbol'], 'name': match['2. name']}
-                        for match in data['bestMatches']
-                    ]
-                    return jsonify(matches), 200
-                return jsonify({'error': 'No matching company found'}), 404
-            return jsonify({'error': 'Alpha Vantage API request failed'}), 500
-        except requests.exceptions.RequestException as e:
-            return jsonify({'error': f'Error fetching data: {str(e)}'}), 500
+            matches = upstream_flight.do(("symbol_search", company_name.strip().lower()),
+                                         remote_symbol_search, company_name)
+        except UpstreamError as e:
+            if local_matches:
+                return jsonify(local_matches), 200
+            status_code = 429 if e.status == "rate_limited" else 500
+            return jsonify({'error': f'Error fetching data: {str(e)}'}), status_code
+        if matches:
+            return jsonify(matches), 200
+        if local_matches:
+            return jsonify(local_matches), 200
+        return jsonify({'error': 'No matching company found'}), 404
     return jsonify({'error': 'Company name is required'}), 400
 
+def refresh_symbol_listing():
+    """Re-download the symbol listing if it is older than ``SYMBOL_LISTING_REFRESH`` and reload the index."""
+    if os.path.exists(SYMBOL_LISTING_PATH) and \
+            time.time() - os.path.getmtime(SYMBOL_LISTING_PATH) < SYMBOL_LISTING_REFRESH:
+        return
+    with background_priority():
+        download_listing(alphavantage, ALPHA_VANTAGE_API_KEY, SYMBOL_LISTING_PATH)
+    symbol_index.load_csv(SYMBOL_LISTING_PATH)
+    symbol_search_cache.clear()
 
-@app.route('/api/search', methods=['GET'])
-def search_catalog():
-    query = request.args.get('q')
-    if not query:
-        return jsonify({'error': 'Query parameter "q" is required'}), 400
+def search_world_bank_catalog(query):
+    """Search the World Bank data catalog and return a list of report dicts.
+
+    Results are cached per normalized query. Raises
+    ``requests.exceptions.RequestException`` if the upstream call fails.
+    """
+    cache_key = query.strip().lower()
+    cached_data = catalog_cache.get(cache_key)
+    if cached_data is not None:
+        return cached_data
+
+    response = worldbank.get(CATALOG_URL, params=catalog_params(query))
+    response.raise_for_status()
+    return store_catalog(query, response.json())
+
+
+CATALOG_URL = 'https://datacatalogapi.worldbank.org/ddhxext/Search'
 
-    url = 'https://datacatalogapi.worldbank.org/ddhxext/Search'
-    params = {
+
+def catalog_params(query):
+    return {
         'qname': 'dataset',
-        'qterm': query,
+        'qterm': query.strip(),
         '$top': 10
     }
 
-    try:
-        
-        response = requests.get(url, params=params)
-
-        
-        print("Response Status Code:", response.status_code)
-        print("Raw Response Text:", response.text)
 
-        response.raise_for_status()
-        external_data = response.json()
+def store_catalog(query, external_data):
+    """Cache and return the report dicts in a catalog search response body."""
+    log_payload(logger, "World Bank catalog response for %r: %s", query, external_data)
 
-        
-        print("External API Response (JSON):", external_data)
+    items = external_data.get("Response", {}).get("value", [])
+    if not isinstance(items, list) or not items:
+        logger.info("World Bank catalog returned no items for %r", query)
+        items = []
 
-        
-        items = external_data.get("Response", {}).get("value", [])
-        if not isinstance(items, list) or not items:
-            print("No valid items found in 'value' key.")
-            return jsonify({'data': []})
+    processed_data = []
+    for item in items:
+        title = item.get("name", "No Title")
+        description = item.get("identification", {}).get("description", "No Description")
+        link = item.get("app_legacy_url", "#")
+        keywords = item.get("keywords_list", [])
 
-        
-        processed_data = []
-        for item in items:
-            title = item.get("name", "No Title")
-            description = item.get("identification", {}).get("description", "No Description")
-            link = item.get("app_legacy_url", "#")
-            keywords = item.get("keywords_list", [])
+        processed_data.append({
+            "title": title,
+            "description": description,
+            "link": link,
+            "keywords": keywords
+        })
 
-            
-            processed_data.append({
-                "title": title,
-                "description": description,
-                "link": link,
-                "keywords": keywords
-            })
+    catalog_cache.set(query.strip().lower(), processed_data)
+    return processed_data
 
-        
-        print("Processed Data:", processed_data)
 
-        
-        return jsonify({'data': processed_data})
+@app.route('/api/search', methods=['GET'])
+def search_catalog():
+    query = request.args.get('q')
+    if not query:
+        return jsonify({'error': 'Query parameter "q" is required'}), 400
 
+    try:
+        return jsonify({'data': search_world_bank_catalog(query)})
     except requests.exceptions.RequestException as e:
-        print("Error fetching data:", e)
+        logger.error("Error searching World Bank catalog for %r: %s", query, e)
         return jsonify({'error': 'Failed to fetch data from external API'}), 500
     except Exception as e:
-        print("Unexpected error:", e)
+        logger.exception("Unexpected error searching World Bank catalog for %r", query)
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
+@app.errorhandler(PasswordPoolBusy)
+def password_pool_busy(error):
+    return jsonify({"message": "Server is busy, please try again."}), 503
+
+@app.route('/api/cache-stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(cache_stats()), 200
+
+@app.route('/api/upstream-stats', methods=['GET'])
+def get_upstream_stats():
+    return jsonify({**upstream_stats(), "openai_time_to_first_token": openai_ttft_stats.as_dict()}), 200
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
 def create_app():
     return app
 
@@ -369,11 +1146,80 @@ def create_app():
 def index():
     return '<h1>Project Server</h1>'
 
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 500))
+SEARCH_PAGE_SIZE = 20
+
+USER_FIELDS = {"id": User.id, "name": User.name}
+COMPANY_FIELDS = {
+    "id": Company.id,
+    "name": Company.name,
+    "category": Category.name,
+    "link": Company.link,
+    "indeed": Company.indeed,
+    "user_id": Company.user_id,
+}
+
+
+def int_arg(name, default=None, minimum=None):
+    """Integer query parameter ``name``, or ``default`` if it is absent.
+
+    Raises ValueError with the message for the client if the value is not an
+    integer or is below ``minimum``, rather than silently falling back to ``default``.
+    """
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return value
+
+
+def list_page(query, id_column, field_columns):
+    """Return a keyset-paginated JSON listing of ``query`` projected onto the requested columns.
+
+    Reads ``limit``, ``cursor`` (the last id already seen) and ``fields`` from the
+    query string. Without ``limit`` every matching row is returned; otherwise the
+    cursor for the next page, if any, is sent in the ``X-Next-Cursor`` header.
+    """
+    try:
+        limit = int_arg('limit')
+        cursor = int_arg('cursor', minimum=0)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    fields = request.args.get('fields')
+    fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else list(field_columns)
+
+    unknown_fields = [field for field in fields if field not in field_columns]
+    if unknown_fields:
+        return jsonify({"error": f"Unknown fields: {', '.join(unknown_fields)}"}), 400
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    query = query.with_entities(id_column, *(field_columns[field] for field in fields)).order_by(id_column)
+    if cursor is not None:
+        query = query.filter(id_column > cursor)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    rows = query.all()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1][0]
+
+    response = jsonify([dict(zip(fields, row[1:])) for row in rows])
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return response
+
 @app.route('/users', methods=['GET', 'POST'])
 def users():
     if request.method == 'GET':
-        users = User.query.all()
-        return jsonify([{"id": user.id, "name": user.name} for user in users])
+        return list_page(User.query, User.id, USER_FIELDS)
 
     if request.method == 'POST':
         data = request.get_json()
@@ -399,6 +1245,10 @@ def login():
     if not user or not user.check_password(password):
         return jsonify({"message": "Invalid credentials"}), 401
 
+    if user.password_needs_rehash():
+        user.password_hash = user.hash_password(password)
+        db.session.commit()
+
     return jsonify({"message": "Login successful!", 'user_id': user.id, 'name': user.name}), 200
 
 @app.route('/logout', methods=['POST'])
@@ -409,17 +1259,17 @@ def logout():
 @app.route('/companies', methods=['GET', 'POST'])
 def companies():
     if request.method == 'GET':
-        companies = Company.query.all()
-        return jsonify([
-            {
-                "id": company.id,
-                "name": company.name,
-                "category": company.category.name if company.category else None,
-                "link": company.link,
-                "indeed": company.indeed,
-                "user_id": company.user_id
-            } for company in companies
-        ])
+        query = Company.query.outerjoin(Company.category)
+        category_name = request.args.get('category')
+        if category_name:
+            query = query.filter(Category.name == category_name)
+        try:
+            user_id = int_arg('user_id')
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if user_id is not None:
+            query = query.filter(Company.user_id == user_id)
+        return list_page(query, Company.id, COMPANY_FIELDS)
 
     if request.method == 'POST':
         data = request.get_json()
@@ -451,6 +1301,30 @@ def companies():
         db.session.commit()
         return jsonify({"message": f"Company '{name}' added successfully."}), 201
 
+@app.route('/companies/search', methods=['GET'])
+def company_search():
+    """Ranked full-text search over company names, links and categories.
+
+    ``cursor`` is the offset of the next page, returned in ``X-Next-Cursor``
+    when more results follow.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+    try:
+        limit = int_arg('limit', SEARCH_PAGE_SIZE)
+        offset = int_arg('cursor', 0, minimum=0)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    rows = search_companies(db.session, query, limit + 1, offset)
+    response = jsonify([dict(zip(COMPANY_FIELDS, row)) for row in rows[:limit]])
+    if len(rows) > limit:
+        response.headers['X-Next-Cursor'] = str(offset + limit)
+    return response
+
 @app.route('/favorites', methods=['GET', 'POST', 'DELETE'])
 def manage_favorites():
     user_id = request.args.get('user_id')
@@ -458,14 +1332,16 @@ def manage_favorites():
         return jsonify({"message": "User ID is required"}), 400
 
     if request.method == 'GET':
-        favorites = Favorites.query.filter_by(user_id=user_id).all()
-        return jsonify([{
-            "company_id": fav.company_id,
-            "company_name": fav.company.name,
-            "link": fav.company.link,
-            "indeed": fav.company.indeed,
-            "category": fav.company.category.name if fav.company.category else None
-        } for fav in favorites]), 200
+        snapshot = profile_snapshot(user_id)
+        if snapshot is None:
+            return jsonify([]), 200
+        return conditional_json([{
+            "company_id": favorite["id"],
+            "company_name": favorite["company_name"],
+            "link": favorite["link"],
+            "indeed": favorite["indeed"],
+            "category": favorite["category"]
+        } for favorite in snapshot["favorites"]], f'{snapshot["etag"]}-favorites')
 
     data = request.get_json()
     company_id = data.get('company_id')
@@ -477,11 +1353,20 @@ def manage_favorites():
         return jsonify({"message": "Company not found"}), 404
 
     if request.method == 'POST':
-        if Favorites.query.filter_by(user_id=user_id, company_id=company_id).first():
-            return jsonify({"message": "Company already in favorites"}), 200
+        # Checked first so a foreign-key violation is never mistaken for a duplicate below.
+        if profile_snapshot(user_id) is None:
+            return jsonify({"message": "User not found"}), 404
         new_favorite = Favorites(user_id=user_id, company_id=company_id)
         db.session.add(new_favorite)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            # Only uq_favorites_user_id_company_id means the favorite already exists.
+            if Favorites.query.filter_by(user_id=user_id, company_id=company_id).first() is None:
+                raise
+            return jsonify({"message": "Company already in favorites"}), 200
+        invalidate_profiles([user_id])
         return jsonify({"message": f"Company '{company.name}' added to favorites."}), 201
 
     if request.method == 'DELETE':
@@ -490,6 +1375,7 @@ def manage_favorites():
             return jsonify({"message": "Favorite not found"}), 404
         db.session.delete(favorite)
         db.session.commit()
+        invalidate_profiles([user_id])
         return jsonify({"message": f"Company '{company.name}' removed from favorites."}), 200
 
 @app.route('/categories', methods=['GET'])
@@ -499,21 +1385,32 @@ def get_categories():
 
 @app.route('/categories/<category_name>', methods=['GET'])
 def view_companies_in_category_and_news(category_name):
-    category = Category.query.filter_by(name=category_name).first()
-    if not category:
+    category = category_companies(category_name)
+    if category is None:
         return jsonify({"message": "Category not found."}), 404
 
+    name, company_names = category
+    return jsonify(category_news(name, company_names, fetch_news_for_companies(company_names)))
+
+
+def category_companies(category_name):
+    """Return ``(category name, company names)`` for ``category_name``, or None if it does not exist."""
+    category = Category.query.filter_by(name=category_name).first()
+    if not category:
+        return None
     companies = Company.query.filter_by(category_id=category.id).all()
+    return category.name, [company.name for company in companies]
+
+
+def category_news(category_name, company_names, articles_per_company):
     companies_info = []
-    for company in companies:
-        news_articles = fetch_news_for_company(company.name)
+    for company_name, news_articles in zip(company_names, articles_per_company):
         companies_info.append({
-            "company_name": company.name,
-            "category": category.name,
+            "company_name": company_name,
+            "category": category_name,
             "news_articles": [{"title": article['title'], "url": article['url']} for article in news_articles]
         })
-
-    return jsonify(companies_info)
+    return companies_info
 
 @app.route('/news/<int:company_id>', methods=['GET'])
 def get_news_for_company(company_id):
@@ -537,23 +1434,12 @@ def get_profile():
     if not user_id:
         return jsonify({"message": "User ID is required"}), 400
 
-    user = User.query.get(user_id)
-    if not user:
+    snapshot = profile_snapshot(user_id)
+    if snapshot is None:
         return jsonify({"message": "User not found"}), 404
 
-    favorites = Favorites.query.filter_by(user_id=user_id).all()
-    profile_data = {
-        "name": user.name,
-        "favorites": [{
-            "id": favorite.company.id, 
-            "company_name": favorite.company.name,
-            "link": favorite.company.link,
-            "indeed": favorite.company.indeed,
-            "category": favorite.company.category.name if favorite.company.category else None
-        } for favorite in favorites]
-    }
-
-    return jsonify(profile_data)
+    return conditional_json({"name": snapshot["name"], "favorites": snapshot["favorites"]},
+                            f'{snapshot["etag"]}-profile')
 
 @app.route('/companies/<company_id>', methods=['PATCH'])
 def update_company(company_id):
@@ -571,14 +1457,17 @@ def update_company(company_id):
         company.indeed = indeed
 
     db.session.commit()
+    invalidate_profiles(users_favoriting([company.id]))
     return jsonify({"message": f"Company {company.name} updated successfully."}), 200
 
 @app.route('/companies/<company_id>', methods=['DELETE'])
 def delete_company(company_id):
     company = Company.query.get(company_id)
     if company:
+        affected_users = users_favoriting([company.id])
         db.session.delete(company)
         db.session.commit()
+        invalidate_profiles(affected_users)
         return jsonify({"message": f"Company {company.name} deleted."}), 200
     return jsonify({"message": "Company not found."}), 404
 
@@ -586,8 +1475,11 @@ def delete_company(company_id):
 def delete_user(user_id):
     user = User.query.get(user_id)
     if user:
+        # Deleting the user also deletes their companies, which may be in others' favorites.
+        affected_users = [user.id] + users_favoriting(company.id for company in user.companies)
         db.session.delete(user)
         db.session.commit()
+        invalidate_profiles(affected_users)
         return jsonify({"message": "User deleted successfully."}), 200
     return jsonify({"message": "User not found."}), 404
 
@@ -617,5 +1509,53 @@ def validate_company_url():
     else:
         return jsonify({"valid": False, "message": "Invalid URL format"}), 200
 
+def prewarm_caches():
+    """Refresh news for every favorited company and metrics for the top stocks before they expire."""
+    horizon = time.time() + PREWARM_INTERVAL
+    with app.app_context():
+        company_names = [name for (name,) in db.session.query(Company.name).join(Favorites).distinct()]
+
+    for company_name in company_names:
+        expires_at = news_cache.expires_at(company_name)
+        if expires_at is None or expires_at < horizon:
+            background_refresher.refresh(("news", company_name), fetch_news_from_api, company_name)
+    for symbol in TOP_STOCK_SYMBOLS:
+        expires_at = financial_metrics_cache.expires_at(symbol)
+        if expires_at is None or expires_at < horizon:
+            background_refresher.refresh(("metrics", symbol), refresh_financial_metrics, symbol)
+
+
+def start_job_workers():
+    """Start the career job workers and the purge of old jobs, once per process."""
+    if JOB_WORKERS <= 0 or job_workers.started:
+        return
+    job_workers.start()
+    PeriodicJob(3600, lambda: career_jobs.purge(JOB_RETENTION), name="job-purge").start()
+
+
+_background_jobs_started = False
+_background_jobs_lock = threading.Lock()
+
+
+def start_background_jobs():
+    """Start the job workers, the periodic cache prewarm and the symbol listing refresh, once per serving process."""
+    global _background_jobs_started
+    with _background_jobs_lock:
+        if _background_jobs_started:
+            return
+        _background_jobs_started = True
+    start_job_workers()
+    if PREWARM_INTERVAL > 0:
+        PeriodicJob(PREWARM_INTERVAL, prewarm_caches, name="cache-prewarm").start()
+    if SYMBOL_LISTING_REFRESH > 0:
+        PeriodicJob(SYMBOL_LISTING_REFRESH, refresh_symbol_listing, name="symbol-listing").start()
+
+
+if START_JOB_WORKERS:
+    start_background_jobs()
+
 if __name__ == '__main__':
+    # The reloader's parent process only watches files; the child serves requests.
+    if is_running_from_reloader():
+        start_background_jobs()
     app.run(port=5555, debug=True)
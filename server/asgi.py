@@ -0,0 +1,628 @@
+# asgi.py
+#
+# ASGI entry point: uvicorn asgi:application --port 5555
+#
+# The routes in ROUTES spend nearly all their time waiting on NewsAPI, Alpha
+# Vantage, the World Bank and OpenAI. Here they run as coroutines on one event
+# loop with aiohttp, so a waiting request holds a socket instead of a thread.
+# Every other route runs in the unchanged Flask app on a thread pool.
+
+import asyncio
+import contextvars
+import io
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import aiohttp
+from flask import Response
+from werkzeug.datastructures import Headers
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map, Rule
+from werkzeug.wrappers import Request
+
+import app as server
+import logs
+import metrics
+from fanout import AsyncFetchPool
+from http_client import UPSTREAMS, UpstreamError, UpstreamRateLimited, retry_after_seconds
+from ratelimit import RateLimitExceeded
+from singleflight import AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+
+ASYNC_MAX_CONNECTIONS = int(os.getenv("ASYNC_MAX_CONNECTIONS", 256))
+# Threads for the blocking parts of async routes: database queries and SQLite cache access.
+ASYNC_SYNC_WORKERS = int(os.getenv("ASYNC_SYNC_WORKERS", 16))
+# Threads running the Flask routes, like the request threads of a threaded WSGI server.
+ASYNC_WSGI_WORKERS = int(os.getenv("ASYNC_WSGI_WORKERS", 32))
+
+TRANSPORT_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+UPSTREAM_ERRORS = TRANSPORT_ERRORS + (UpstreamRateLimited,)
+
+sync_executor = ThreadPoolExecutor(max_workers=ASYNC_SYNC_WORKERS, thread_name_prefix="asgi-sync")
+wsgi_executor = ThreadPoolExecutor(max_workers=ASYNC_WSGI_WORKERS, thread_name_prefix="asgi-wsgi")
+fetch_pool = AsyncFetchPool(
+    max_in_flight=int(os.getenv("ASYNC_FETCH_MAX_IN_FLIGHT", 256)),
+    per_host_limit=int(os.getenv("ASYNC_FETCH_PER_HOST_LIMIT", 64)),
+)
+upstream_flight = AsyncSingleFlight()
+
+
+async def run_sync(fn, *args):
+    """Run blocking ``fn`` on ``sync_executor`` inside an app context, keeping the caller's request id."""
+    context = contextvars.copy_context()
+
+    def call():
+        with server.app.app_context():
+            return fn(*args)
+
+    return await asyncio.get_running_loop().run_in_executor(sync_executor, context.run, call)
+
+
+# With CACHE_BACKEND=sqlite every cache read and write is file I/O that can wait on the
+# database lock, so it runs on sync_executor; in-memory lookups stay on the event loop.
+CACHE_ON_DISK = server.news_cache.backend != "memory"
+
+
+async def cache_io(fn, *args):
+    """Call ``fn``, which reads or writes the caches, off the event loop when they are file-backed."""
+    if CACHE_ON_DISK:
+        return await run_sync(fn, *args)
+    return fn(*args)
+
+
+def retry_after(response, default):
+    wait = retry_after_seconds(response.headers)
+    return default if wait is None else wait
+
+
+class BufferedResponse:
+    """A fully read ``aiohttp.ClientResponse`` with the ``requests.Response`` attributes the parsers in app.py use."""
+
+    def __init__(self, response, content):
+        self._response = response
+        self.status_code = response.status
+        self.headers = response.headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        self._response.raise_for_status()
+
+
+class AsyncUpstreamClient:
+    """aiohttp session with the timeouts, retry policy, rate limiter and stats of an ``UpstreamClient``.
+
+    Stats go to the wrapped client, so ``/api/upstream-stats`` and ``/metrics``
+    count calls from both modes together.
+    """
+
+    def __init__(self, upstream, max_connections=ASYNC_MAX_CONNECTIONS):
+        self.upstream = upstream
+        self.max_connections = max_connections
+        self.session = None
+
+    def _session(self):
+        # Created on first use so it belongs to the server's event loop.
+        if self.session is None:
+            connect_timeout, read_timeout = self.upstream.timeout
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout),
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+            )
+        return self.session
+
+    async def send(self, method, url, **kwargs):
+        """Make one attempt, without retries or stats; returns the unread ``aiohttp.ClientResponse``."""
+        return await self._session().request(method, url, **kwargs)
+
+    async def _acquire(self):
+        if self.upstream.limiter is not None:
+            try:
+                await self.upstream.limiter.acquire_async()
+            except RateLimitExceeded as e:
+                raise UpstreamRateLimited(str(e)) from e
+
+    async def request(self, method, url, stream=False, **kwargs):
+        """Send a request, retrying like the sync client; returns a ``BufferedResponse``.
+
+        With ``stream`` the unread ``aiohttp.ClientResponse`` is returned instead
+        and the caller must close it.
+        """
+        upstream = self.upstream
+        await self._acquire()
+        if "params" in kwargs:
+            # requests leaves out None values; aiohttp rejects them.
+            kwargs["params"] = {key: value for key, value in kwargs["params"].items() if value is not None}
+
+        retry = upstream.retry
+        retries = retry.total if method in retry.allowed_methods else 0
+        start = time.perf_counter()
+        error = True
+        try:
+            for attempt in range(retries + 1):
+                if attempt:
+                    # Retries are charged a token too, like UpstreamClient._send.
+                    await self._acquire()
+                backoff = retry.backoff_factor * 2 ** attempt
+                try:
+                    response = await self.send(method, url, **kwargs)
+                except TRANSPORT_ERRORS:
+                    if attempt == retries:
+                        raise
+                    await asyncio.sleep(backoff)
+                    continue
+                if attempt == retries or response.status not in retry.status_forcelist:
+                    status = response.status
+                    if not stream:
+                        response = BufferedResponse(response, await response.read())
+                    error = status >= 400
+                    return response
+                response.release()
+                await asyncio.sleep(retry_after(response, backoff))
+        finally:
+            elapsed = time.perf_counter() - start
+            upstream.stats.record(elapsed, error=error)
+            metrics.upstream_duration.observe(elapsed, upstream.name, urlsplit(url).hostname or "",
+                                              "error" if error else "ok")
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        if self.session is not None:
+            await self.session.close()
+
+
+clients = {name: AsyncUpstreamClient(upstream) for name, upstream in UPSTREAMS.items()}
+
+
+async def fetch_news_from_api(company_name):
+    return await upstream_flight.do(("news", company_name), _request_news, company_name)
+
+
+async def _request_news(company_name):
+    try:
+        response = await clients["newsapi"].get(server.NEWS_API_URL, params=server.news_params(company_name))
+    except UPSTREAM_ERRORS as e:
+        logger.error("Error fetching news for %s: %s", company_name, e)
+        return []
+
+    return await cache_io(server.store_news, company_name, response)
+
+
+async def fetch_news_for_companies(company_names, desired_article_count=5):
+    articles_by_name, misses = await cache_io(server.cached_news_for, company_names)
+    fetched = await fetch_pool.map(fetch_news_from_api, misses, host="newsapi.org",
+                                   timeout=server.FETCH_TIMEOUT, default=[])
+    articles_by_name.update(zip(misses, fetched))
+
+    return [server.filter_articles(articles_by_name[name], desired_article_count) for name in company_names]
+
+
+async def search_world_bank_catalog(query):
+    cached_data = await cache_io(server.catalog_cache.get, query.strip().lower())
+    if cached_data is not None:
+        return cached_data
+
+    response = await clients["worldbank"].get(server.CATALOG_URL, params=server.catalog_params(query))
+    response.raise_for_status()
+    return await cache_io(server.store_catalog, query, response.json())
+
+
+async def build_career_prompt(user_id, data):
+    """``app.build_career_prompt``, with the news and catalog lookups awaited concurrently."""
+    snapshot = await run_sync(server.profile_snapshot, user_id)
+    favorite_companies = snapshot["favorites"] if snapshot else []
+    selected_report = data.get('selectedReport', '')
+
+    async def find_reports():
+        if not selected_report:
+            return None
+        try:
+            return await search_world_bank_catalog(selected_report)
+        except Exception as e:
+            logger.error("Error searching World Bank catalog for %r: %s", selected_report, e)
+            return None
+
+    articles_per_company, reports = await asyncio.gather(
+        fetch_news_for_companies([company['company_name'] for company in favorite_companies],
+                                 desired_article_count=3),
+        find_reports(),
+    )
+    return server.format_career_prompt(user_id, data, favorite_companies, articles_per_company, reports)
+
+
+async def request_career_analysis(api_data, use_cache=True):
+    cache_key = server.completion_cache_key(api_data)
+    if use_cache:
+        cached_response = await cache_io(server.completion_cache.get, cache_key)
+        if cached_response is not None:
+            return cached_response
+
+    response = await clients["openai"].post(server.OPENAI_CHAT_URL, headers=server.openai_headers(), json=api_data)
+    response.raise_for_status()
+    return await cache_io(server.store_completion, cache_key, response.json())
+
+
+class EventStream:
+    """A ``text/event-stream`` response whose body is an async iterator of event strings."""
+
+    def __init__(self, events, headers=None):
+        self.events = events
+        self.status_code = 200
+        self.headers = Headers(headers or {})
+        self.headers["Content-Type"] = "text/event-stream; charset=utf-8"
+
+
+async def stream_career_analysis(api_data, use_cache=True):
+    """Same events as ``app.stream_career_analysis``, read from OpenAI without holding a thread."""
+    cache_key = server.completion_cache_key(api_data)
+    cached_response = await cache_io(server.completion_cache.get, cache_key) if use_cache else None
+    if cached_response is not None:
+        body = server.sse_event({"delta": cached_response}) + server.sse_event({}, "done")
+        return Response(body, mimetype="text/event-stream", headers=server.SSE_HEADERS)
+
+    started = time.perf_counter()
+    try:
+        upstream = await clients["openai"].post(server.OPENAI_CHAT_URL, headers=server.openai_headers(),
+                                                json={**api_data, "stream": True}, stream=True)
+        # Releases the connection before raising.
+        upstream.raise_for_status()
+    except UPSTREAM_ERRORS as e:
+        logger.error("Error during OpenAI request: %s", e)
+        return jsonify({"error": str(e)}, 500)
+
+    async def events():
+        first_token = True
+        parts = []
+        try:
+            async for line in upstream.content:
+                delta = server.stream_delta(line.decode("utf-8", "replace").rstrip("\r\n"))
+                if delta is None:
+                    break
+                if not delta:
+                    continue
+                if first_token:
+                    first_token = False
+                    server.openai_ttft_stats.record(time.perf_counter() - started)
+                parts.append(delta)
+                yield server.sse_event({"delta": delta})
+            else:
+                # Only a stream that reached [DONE] is complete enough to cache.
+                raise server.OpenAIStreamError("OpenAI stream ended before completion")
+            await cache_io(server.completion_cache.set, cache_key, "".join(parts).strip())
+            yield server.sse_event({}, "done")
+        except TRANSPORT_ERRORS + (server.OpenAIStreamError,) as e:
+            logger.error("OpenAI stream failed: %s", e)
+            yield server.sse_event({"error": str(e)}, "error")
+        finally:
+            upstream.close()
+
+    return EventStream(events(), headers=server.SSE_HEADERS)
+
+
+async def fetch_world_bank_indicator(indicator):
+    entry = await cache_io(server.world_bank_cache.get_stale, indicator)
+    if entry is not None:
+        compact, fresh = entry
+        if not fresh:
+            server.background_refresher.refresh(("world_bank", indicator),
+                                                server.refresh_world_bank_indicator, indicator)
+        return compact
+
+    return await upstream_flight.do(("world_bank", indicator), _request_world_bank_indicator, indicator)
+
+
+async def _request_world_bank_page(indicator, page):
+    try:
+        response = await clients["worldbank"].get(server.world_bank_indicator_url(indicator),
+                                                  params=server.world_bank_page_params(page))
+    except UPSTREAM_ERRORS as e:
+        logger.error("Error fetching World Bank data for %s: %s", indicator, e)
+        raise UpstreamError(str(e))
+    return server.parse_world_bank_page(indicator, response)
+
+
+async def _request_world_bank_indicator(indicator):
+    meta, records = await _request_world_bank_page(indicator, 1)
+    remaining = list(range(2, int(meta.get("pages", 1)) + 1))
+    pages = await fetch_pool.map(lambda page: _request_world_bank_page(indicator, page), remaining,
+                                 host="api.worldbank.org", timeout=server.FETCH_TIMEOUT, default=None)
+    if any(page is None for page in pages):
+        raise UpstreamError(f"Timed out fetching World Bank data for {indicator}")
+    for _, page_records in pages:
+        records.extend(page_records)
+    return await cache_io(server.store_world_bank_indicator, indicator, records)
+
+
+async def fetch_financial_metrics(company_symbol):
+    entry = await cache_io(server.financial_metrics_cache.get_stale, company_symbol)
+    if entry is not None:
+        metrics_data, fresh = entry
+        if not fresh:
+            server.background_refresher.refresh(("metrics", company_symbol),
+                                                server.refresh_financial_metrics, company_symbol)
+        return metrics_data
+
+    return await upstream_flight.do(("metrics", company_symbol), _request_financial_metrics, company_symbol)
+
+
+async def _request_financial_metrics(company_symbol):
+    try:
+        response = await clients["alphavantage"].get(server.ALPHA_VANTAGE_URL,
+                                                     params=server.financial_metrics_params(company_symbol))
+    except UPSTREAM_ERRORS as e:
+        logger.error("Error fetching financial metrics for %s: %s", company_symbol, e)
+        raise UpstreamError(str(e), status=getattr(e, "status", "error"))
+    return await cache_io(server.store_financial_metrics, company_symbol, response)
+
+
+async def top_stock_entry(symbol):
+    try:
+        stock_data = await fetch_financial_metrics(symbol)
+    except UpstreamError as e:
+        return {"symbol": symbol, "status": e.status, "error": str(e)}
+    return {**stock_data, "symbol": symbol, "status": "ok"}
+
+
+def jsonify(payload, status=200):
+    response = server.app.json.response(payload)
+    response.status_code = status
+    return response
+
+
+async def career_assistant(request):
+    data = request.get_json()
+
+    user_id = data.get('user_id')
+    if not user_id:
+        logger.warning("Career assistant called without a user")
+        return jsonify({"message": "User not logged in."}, 401)
+
+    try:
+        use_cache = server.bool_field(data, 'cache', True)
+    except ValueError as e:
+        return jsonify({"error": str(e)}, 400)
+    if use_cache and not data.get('stream'):
+        finished = await run_sync(server.finished_career_analysis, user_id, data)
+        if finished is not None:
+            return jsonify({"response": finished})
+
+    api_data = server.career_completion_request(await build_career_prompt(user_id, data))
+
+    if data.get('stream'):
+        return await stream_career_analysis(api_data, use_cache=use_cache)
+
+    try:
+        return jsonify({"response": await request_career_analysis(api_data, use_cache=use_cache)})
+    except UPSTREAM_ERRORS as e:
+        logger.error("Error during OpenAI request: %s", e)
+        return jsonify({"error": str(e)}, 500)
+
+
+async def view_companies_in_category_and_news(request, category_name):
+    category = await run_sync(server.category_companies, category_name)
+    if category is None:
+        return jsonify({"message": "Category not found."}, 404)
+
+    name, company_names = category
+    return jsonify(server.category_news(name, company_names, await fetch_news_for_companies(company_names)))
+
+
+async def get_top_stocks(request):
+    symbols = server.requested_symbols(request.args.get('symbols'))
+    if len(symbols) > server.MAX_TOP_STOCK_SYMBOLS:
+        return jsonify({"error": f"At most {server.MAX_TOP_STOCK_SYMBOLS} symbols can be requested"}, 400)
+
+    results = await fetch_pool.map(top_stock_entry, symbols, host="www.alphavantage.co",
+                                   timeout=server.FETCH_TIMEOUT, default=None)
+    return jsonify(server.top_stocks(symbols, results))
+
+
+async def get_world_bank_data(request):
+    try:
+        query = server.world_bank_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}, 400)
+
+    try:
+        compact = await fetch_world_bank_indicator(query["indicator"])
+    except UpstreamError as e:
+        if e.status == "not_found":
+            return jsonify({"error": str(e)}, 404)
+        return jsonify({"error": "Failed to fetch World Bank data"}, 500)
+
+    return jsonify(server.world_bank_page(compact, query))
+
+
+async def search_catalog(request):
+    query = request.args.get('q')
+    if not query:
+        return jsonify({'error': 'Query parameter "q" is required'}, 400)
+
+    try:
+        return jsonify({'data': await search_world_bank_catalog(query)})
+    except UPSTREAM_ERRORS as e:
+        logger.error("Error searching World Bank catalog for %r: %s", query, e)
+        return jsonify({'error': 'Failed to fetch data from external API'}, 500)
+    except Exception:
+        logger.exception("Unexpected error searching World Bank catalog for %r", query)
+        return jsonify({'error': 'An unexpected error occurred'}, 500)
+
+
+# Same rules as the Flask routes they replace; OPTIONS preflights still go to Flask-CORS.
+ROUTES = Map([
+    Rule('/career-assistant', methods=['POST'], endpoint=career_assistant),
+    Rule('/categories/<category_name>', methods=['GET'], endpoint=view_companies_in_category_and_news),
+    Rule('/api/top-stocks', methods=['GET'], endpoint=get_top_stocks),
+    Rule('/api/world-bank', methods=['GET'], endpoint=get_world_bank_data),
+    Rule('/api/search', methods=['GET'], endpoint=search_catalog),
+]).bind("localhost")
+
+def wsgi_environ(scope, body):
+    """WSGI environ for an ASGI HTTP ``scope`` whose request body has been read into ``body``."""
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "REMOTE_ADDR": scope["client"][0] if scope.get("client") else "",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        name, value = name.decode("latin-1").upper().replace("-", "_"), value.decode("latin-1")
+        key = name if name == "CONTENT_TYPE" else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def add_cors_headers(request, response):
+    """The headers Flask-CORS adds to the Flask routes."""
+    origin = request.headers.get("Origin")
+    if origin == server.CORS_ORIGIN:
+        response.headers["Access-Control-Allow-Origin"] = origin
+        response.headers["Access-Control-Allow-Credentials"] = "true"
+        response.headers["Access-Control-Expose-Headers"] = ", ".join(server.CORS_EXPOSE_HEADERS)
+    response.headers.add("Vary", "Origin")
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def stream_events(events, send):
+    try:
+        async for event in events:
+            await send({"type": "http.response.body", "body": event.encode("utf-8"), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        await events.aclose()
+
+
+async def send_response(response, receive, send):
+    await send({
+        "type": "http.response.start",
+        "status": response.status_code,
+        "headers": [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                    for name, value in response.headers.items()],
+    })
+    if not isinstance(response, EventStream):
+        await send({"type": "http.response.body", "body": response.get_data()})
+        return
+
+    # Stop reading from OpenAI as soon as the client goes away.
+    streaming = asyncio.ensure_future(stream_events(response.events, send))
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await asyncio.wait([streaming, disconnected], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        streaming.cancel()
+        disconnected.cancel()
+
+
+async def handle(endpoint, rule, path_values, scope, receive, send):
+    start = time.perf_counter()
+    request = Request(wsgi_environ(scope, await read_body(receive)))
+    request_id = logs.resolve_request_id(request.headers.get(logs.REQUEST_ID_HEADER))
+    logs.request_id_var.set(request_id)
+
+    try:
+        response = await endpoint(request, **path_values)
+    except HTTPException as e:
+        response = jsonify({"message": e.description}, e.code)
+    except Exception:
+        logger.exception("Unhandled error in %s %s", request.method, rule)
+        response = jsonify({"message": "Internal Server Error"}, 500)
+
+    response.headers[logs.REQUEST_ID_HEADER] = request_id
+    add_cors_headers(request, response)
+    metrics.request_duration.observe(time.perf_counter() - start, request.method, rule, str(response.status_code))
+    await send_response(response, receive, send)
+
+
+def run_wsgi(environ):
+    """Call the Flask app and return ``(status, headers, body)`` with the body fully read."""
+    started = []
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [status, headers]
+
+    result = server.app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    status, headers = started
+    return int(status.split(" ", 1)[0]), headers, body
+
+
+async def call_flask(scope, receive, send):
+    environ = wsgi_environ(scope, await read_body(receive))
+    status, headers, body = await asyncio.get_running_loop().run_in_executor(wsgi_executor, run_wsgi, environ)
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            server.start_background_jobs()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            for client in clients.values():
+                await client.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] == "http":
+        try:
+            rule, path_values = ROUTES.match(scope["path"], scope["method"], return_rule=True)
+        except HTTPException:
+            rule = None
+        if rule is not None:
+            await handle(rule.endpoint, rule.rule, path_values, scope, receive, send)
+            return
+    await call_flask(scope, receive, send)
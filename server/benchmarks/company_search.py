@@ -0,0 +1,87 @@
+"""Compare /companies/search with fetching /companies and filtering client-side.
+
+Seeds a throwaway SQLite database migrated to head with synthetic companies,
+then times both approaches for the same queries and reports the response
+size each one transfers.
+
+    cd server && python -m benchmarks.company_search --companies 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+_db_dir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_db_dir, 'bench.db')}")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from flask_migrate import upgrade
+
+import app as server
+from config import db
+from models import Company
+from seed import seed, synthetic_companies, synthetic_user_names
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def full_scan(client, query):
+    response = client.get("/companies")
+    needle = query.lower()
+    matches = [
+        company for company in response.get_json()
+        if needle in company["name"].lower()
+        or needle in (company["link"] or "").lower()
+        or needle in (company["category"] or "").lower()
+    ]
+    return matches[:20], len(response.data)
+
+
+def indexed_search(client, query):
+    response = client.get("/companies/search", query_string={"q": query})
+    return response.get_json(), len(response.data)
+
+
+def measure(search, client, queries):
+    timings, sizes = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, size = search(client, query)
+        timings.append(time.perf_counter() - start)
+        sizes.append(size)
+    return percentile(timings, 0.5), percentile(timings, 0.99), sum(sizes) / len(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--companies", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(0)
+    with server.app.app_context():
+        upgrade(directory=MIGRATIONS)
+        seed(synthetic_companies(args.companies), synthetic_user_names(50))
+        names = [name for (name,) in db.session.query(Company.name).limit(5000)]
+
+    queries = [random.choice(names).split()[0].strip(",") for _ in range(args.queries)]
+    client = server.app.test_client()
+
+    print(f"{args.companies} companies, {args.queries} queries")
+    print(f"{'approach':<18} {'p50 (ms)':>10} {'p99 (ms)':>10} {'avg response (KB)':>18}")
+    for label, search in (("full scan", full_scan), ("/companies/search", indexed_search)):
+        p50, p99, size = measure(search, client, queries)
+        print(f"{label:<18} {p50 * 1000:>10.1f} {p99 * 1000:>10.1f} {size / 1024:>18.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Time the hot lookups before and after the 4c1d9e7a2f36 index migration.
+
+Builds a throwaway SQLite database at the previous revision, fills it with
+synthetic rows, times each lookup, upgrades to head and times them again.
+
+    cd server && python -m benchmarks.index_lookups --companies 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+_db_dir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_db_dir, 'bench.db')}")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from flask_migrate import upgrade
+from sqlalchemy import insert, text
+
+import app as server
+from config import db
+from models import Category, Company, Favorites, User
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+PREVIOUS_REVISION = "b886fb81cfa1"
+
+LOOKUPS = {
+    "login (users.name)": ("SELECT id FROM users WHERE name = :name", "name"),
+    "favorite exists (user_id, company_id)": (
+        "SELECT id FROM favorites WHERE user_id = :user_id AND company_id = :company_id",
+        "favorite",
+    ),
+    "favorites by user_id": ("SELECT company_id FROM favorites WHERE user_id = :user_id", "user_id"),
+    "companies by user_id": ("SELECT id FROM companies WHERE user_id = :user_id", "user_id"),
+    "companies by category_id": ("SELECT id FROM companies WHERE category_id = :category_id", "category_id"),
+}
+
+
+def populate(users, companies, favorites, categories):
+    db.session.execute(insert(Category), [{"name": f"Category{i}"} for i in range(categories)])
+    db.session.execute(insert(User), [
+        {"name": f"user{i}", "password_hash": "x"} for i in range(users)
+    ])
+    db.session.execute(insert(Company), [
+        {"name": f"Company{i}", "category_id": i % categories + 1, "user_id": i % users + 1}
+        for i in range(companies)
+    ])
+    pairs = set()
+    while len(pairs) < favorites:
+        pairs.add((random.randint(1, users), random.randint(1, companies)))
+    db.session.execute(insert(Favorites), [
+        {"user_id": user_id, "company_id": company_id} for user_id, company_id in pairs
+    ])
+    db.session.commit()
+    return sorted(pairs)
+
+
+def make_params(kind, args, pairs):
+    if kind == "name":
+        return {"name": f"user{random.randrange(args.users)}"}
+    if kind == "favorite":
+        user_id, company_id = random.choice(pairs)
+        return {"user_id": user_id, "company_id": company_id}
+    if kind == "user_id":
+        return {"user_id": random.randint(1, args.users)}
+    return {"category_id": random.randint(1, args.categories)}
+
+
+def time_lookups(args, pairs):
+    timings = {}
+    for label, (sql, kind) in LOOKUPS.items():
+        statement = text(sql)
+        params = [make_params(kind, args, pairs) for _ in range(args.iterations)]
+        start = time.perf_counter()
+        for param in params:
+            db.session.execute(statement, param).fetchall()
+        timings[label] = (time.perf_counter() - start) / args.iterations
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--companies", type=int, default=100000)
+    parser.add_argument("--favorites", type=int, default=200000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(0)
+    with server.app.app_context():
+        upgrade(directory=MIGRATIONS, revision=PREVIOUS_REVISION)
+        pairs = populate(args.users, args.companies, args.favorites, args.categories)
+        before = time_lookups(args, pairs)
+        db.session.remove()
+
+        upgrade(directory=MIGRATIONS)
+        after = time_lookups(args, pairs)
+
+    print(f"{args.users} users, {args.companies} companies, {args.favorites} favorites")
+    print(f"{'lookup':<40} {'before (ms)':>12} {'after (ms)':>12} {'speedup':>9}")
+    for label in LOOKUPS:
+        print(f"{label:<40} {before[label] * 1000:>12.3f} {after[label] * 1000:>12.3f} "
+              f"{before[label] / after[label]:>8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
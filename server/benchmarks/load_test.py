@@ -0,0 +1,209 @@
+"""Load-test the main API endpoints against stub upstreams and a synthetic database.
+
+Boots the app on a local threaded server with NewsAPI, Alpha Vantage, World
+Bank and OpenAI replaced by stubs (see benchmarks/stubs.py), seeds a
+throwaway SQLite database, then drives each endpoint from concurrent clients
+and reports throughput and p50/p99 latency. Save a run with --save and
+compare a later one against it with --baseline to catch regressions. With
+--asgi the app is served by uvicorn through asgi.py instead.
+
+    cd server && python -m benchmarks.load_test --companies 2000 --users 50 --concurrency 16
+    cd server && python -m benchmarks.load_test --asgi --concurrency 200 --latency 0.5 --cold
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+_db_dir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_db_dir, 'bench.db')}")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# The job queue is a file of its own; keep it in the temp dir and never run queued jobs here.
+os.environ.setdefault("JOBS_PATH", os.path.join(_db_dir, "jobs.db"))
+os.environ["JOB_WORKERS"] = "0"
+# The stubs have no quotas, so client-side rate limits would only measure the limiter.
+os.environ.setdefault("NEWSAPI_RATE_PER_MINUTE", "0")
+os.environ.setdefault("ALPHAVANTAGE_RATE_PER_MINUTE", "0")
+
+import requests
+from flask_migrate import upgrade
+from werkzeug.serving import make_server
+
+import app as server
+from benchmarks.stubs import redirect_async_upstreams, redirect_upstreams, start_stubs
+from cache import _caches
+from config import db
+from http_client import UPSTREAMS
+from models import Category, User
+from seed import SEED_PASSWORD, seed, synthetic_companies, synthetic_user_names
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def scenarios(user_ids, user_names, categories):
+    """Endpoint label -> function building ``(method, path, json_body)`` for one request."""
+    return {
+        "GET /companies": lambda: ("GET", "/companies?limit=100", None),
+        "GET /favorites": lambda: ("GET", f"/favorites?user_id={random.choice(user_ids)}", None),
+        "GET /profile": lambda: ("GET", f"/profile?user_id={random.choice(user_ids)}", None),
+        "GET /categories/<name>": lambda: ("GET", f"/categories/{random.choice(categories)}", None),
+        "GET /api/top-stocks": lambda: ("GET", "/api/top-stocks", None),
+        "GET /api/world-bank": lambda: ("GET", "/api/world-bank?indicator=SP.POP.TOTL&country=C01", None),
+        "GET /api/search": lambda: ("GET", f"/api/search?q={random.choice(categories)}", None),
+        "POST /career-assistant": lambda: (
+            "POST", "/career-assistant", {"user_id": random.choice(user_ids), "prompt": "What next?"}),
+        "POST /login": lambda: (
+            "POST", "/login", {"name": random.choice(user_names), "password": SEED_PASSWORD}),
+    }
+
+
+def serve_wsgi():
+    """Serve the Flask app on a threaded werkzeug server; returns ``(port, stop)``."""
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    http_server = make_server("127.0.0.1", 0, server.app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    return http_server.server_port, http_server.shutdown
+
+
+def serve_asgi(stubs):
+    """Serve ``asgi.application`` with uvicorn on a background thread; returns ``(port, stop)``."""
+    # Only needed here, so the threaded benchmark runs without the async dependencies.
+    import uvicorn
+    import asgi
+
+    redirect_async_upstreams(asgi.clients, stubs)
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    uvicorn_server = uvicorn.Server(uvicorn.Config(asgi.application, log_config=None, access_log=False))
+    threading.Thread(target=uvicorn_server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+    while not uvicorn_server.started:
+        time.sleep(0.01)
+
+    def stop():
+        uvicorn_server.should_exit = True
+
+    return sock.getsockname()[1], stop
+
+
+def drive(base_url, build_request, concurrency, requests_per_client, cold):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def client():
+        session = requests.Session()
+        timings, failed = [], 0
+        for _ in range(requests_per_client):
+            if cold:
+                for cache in _caches.values():
+                    cache.clear()
+            method, path, body = build_request()
+            start = time.perf_counter()
+            response = session.request(method, base_url + path, json=body)
+            timings.append(time.perf_counter() - start)
+            failed += response.status_code >= 400
+        with lock:
+            latencies.extend(timings)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "errors": errors[0],
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return the endpoints whose p99 grew or throughput dropped by more than ``tolerance``."""
+    regressions = []
+    for endpoint, result in results.items():
+        previous = baseline.get(endpoint)
+        if previous is None:
+            continue
+        if result["p99_ms"] > previous["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{endpoint}: p99 {previous['p99_ms']:.1f} -> {result['p99_ms']:.1f} ms")
+        if result["requests_per_second"] < previous["requests_per_second"] * (1 - tolerance):
+            regressions.append(f"{endpoint}: {previous['requests_per_second']:.1f} -> "
+                               f"{result['requests_per_second']:.1f} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--companies", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=25, help="requests per client per endpoint")
+    parser.add_argument("--endpoints", nargs="+", help="only run endpoints whose label contains one of these")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- random seconds added to --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub calls answered 503")
+    parser.add_argument("--cold", action="store_true", help="clear every cache before each request")
+    parser.add_argument("--asgi", action="store_true", help="serve asgi.application with uvicorn")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file from an earlier --save to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    random.seed(0)
+    stubs = start_stubs(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    redirect_upstreams(UPSTREAMS, stubs)
+
+    with server.app.app_context():
+        upgrade(directory=MIGRATIONS)
+        seed(synthetic_companies(args.companies), synthetic_user_names(args.users))
+        user_ids = [user_id for (user_id,) in db.session.query(User.id)]
+        user_names = [name for (name,) in db.session.query(User.name)]
+        categories = [name for (name,) in db.session.query(Category.name)]
+
+    port, stop = serve_asgi(stubs) if args.asgi else serve_wsgi()
+    base_url = f"http://127.0.0.1:{port}"
+
+    print(f"{args.companies} companies, {len(user_ids)} users, {args.concurrency} clients x "
+          f"{args.requests} requests, stub latency {args.latency * 1000:.0f} ms, "
+          f"error rate {args.error_rate:.0%}{', cold caches' if args.cold else ''}"
+          f"{', asgi' if args.asgi else ''}")
+    print(f"{'endpoint':<26} {'req/s':>8} {'p50 (ms)':>10} {'p99 (ms)':>10} {'errors':>7}")
+    results = {}
+    for label, build_request in scenarios(user_ids, user_names, categories).items():
+        if args.endpoints and not any(name in label for name in args.endpoints):
+            continue
+        result = results[label] = drive(base_url, build_request, args.concurrency, args.requests, args.cold)
+        print(f"{label:<26} {result['requests_per_second']:>8.1f} {result['p50_ms']:>10.1f} "
+              f"{result['p99_ms']:>10.1f} {result['errors']:>7}")
+    stop()
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
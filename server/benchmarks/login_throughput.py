@@ -0,0 +1,81 @@
+"""Measure /login throughput and latency for several bcrypt work factors.
+
+Pick the highest BCRYPT_ROUNDS whose p99 fits the login latency budget.
+
+    cd server && python -m benchmarks.login_throughput --rounds 10 11 12 --concurrency 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import app as server
+import passwords
+from config import db
+from models import User
+
+PASSWORD = "benchmark-password"
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(rounds, concurrency, requests_per_thread):
+    passwords.BCRYPT_ROUNDS = rounds
+    with server.app.app_context():
+        User.query.delete()
+        db.session.add(User(name="bench", password=PASSWORD))
+        db.session.commit()
+
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        client = server.app.test_client()
+        timings = []
+        for _ in range(requests_per_thread):
+            start = time.perf_counter()
+            response = client.post("/login", json={"name": "bench", "password": PASSWORD})
+            timings.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.get_json()
+        with lock:
+            latencies.extend(timings)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=10, help="logins per thread")
+    args = parser.parse_args()
+
+    with server.app.app_context():
+        db.create_all()
+
+    print(f"{passwords.PASSWORD_WORKERS} password workers, {args.concurrency} concurrent clients")
+    print(f"{'rounds':>6} {'logins/s':>10} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    for rounds in args.rounds:
+        throughput, p50, p99 = run(rounds, args.concurrency, args.requests)
+        print(f"{rounds:>6} {throughput:>10.1f} {p50 * 1000:>10.1f} {p99 * 1000:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
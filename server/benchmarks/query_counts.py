@@ -0,0 +1,111 @@
+"""Assert that list endpoints issue a constant number of SQL queries.
+
+Seeds an in-memory database at two sizes, calls each endpoint and checks the
+number of statements executed stays within its budget at both sizes.
+
+    cd server && python -m benchmarks.query_counts
+"""
+
+import os
+import sys
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from sqlalchemy import event
+
+import app as server
+from config import db
+from models import Category, Company, Favorites, User
+
+# endpoint -> maximum number of SQL statements per request
+QUERY_BUDGETS = {
+    "GET /companies": 1,
+    "GET /favorites": 1,
+    "GET /profile": 1,
+    "POST /career-assistant": 1,
+    "GET /categories/<name>": 2,
+}
+
+
+class _FakeCompletion:
+    status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"choices": [{"message": {"content": "ok"}}]}
+
+
+def seed(size):
+    db.drop_all()
+    db.create_all()
+    categories = [Category(name=f"Category{i}") for i in range(3)]
+    user = User(name="bench", password="bench")
+    db.session.add_all(categories + [user])
+    db.session.flush()
+    companies = [
+        Company(name=f"Company{i}", link=f"https://example.com/{i}",
+                category=categories[i % len(categories)], user_id=user.id)
+        for i in range(size)
+    ]
+    db.session.add_all(companies)
+    db.session.flush()
+    db.session.add_all(Favorites(user_id=user.id, company_id=company.id) for company in companies)
+    db.session.commit()
+    return user.id
+
+
+def count_queries(client, method, url, **kwargs):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with server.app.app_context():
+        engine = db.engine
+    # Measure the cold path that builds the profile snapshot.
+    server.profile_cache.clear()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.open(url, method=method, **kwargs)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code < 400, f"{method} {url} returned {response.status_code}"
+    return len(statements)
+
+
+def measure(size):
+    with server.app.app_context():
+        user_id = seed(size)
+    client = server.app.test_client()
+    return {
+        "GET /companies": count_queries(client, "GET", "/companies"),
+        "GET /favorites": count_queries(client, "GET", f"/favorites?user_id={user_id}"),
+        "GET /profile": count_queries(client, "GET", f"/profile?user_id={user_id}"),
+        "POST /career-assistant": count_queries(
+            client, "POST", "/career-assistant", json={"user_id": user_id}),
+        "GET /categories/<name>": count_queries(client, "GET", "/categories/Category0"),
+    }
+
+
+def main():
+    server.fetch_news_for_companies = lambda names, desired_article_count=5: [[] for _ in names]
+    server.openai_api.post = lambda *args, **kwargs: _FakeCompletion()
+
+    small, large = measure(5), measure(200)
+    failures = []
+    for endpoint, budget in QUERY_BUDGETS.items():
+        print(f"{endpoint:<26} {small[endpoint]:>3} queries @5 rows  {large[endpoint]:>3} queries @200 rows")
+        if small[endpoint] != large[endpoint] or large[endpoint] > budget:
+            failures.append(endpoint)
+
+    if failures:
+        print(f"Query budget exceeded for: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
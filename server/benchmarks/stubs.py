@@ -0,0 +1,162 @@
+"""Local HTTP servers standing in for NewsAPI, Alpha Vantage, World Bank and OpenAI.
+
+Each stub answers with canned payloads shaped like the real API, after a
+configurable delay, and fails a configurable fraction of requests with a 503.
+``redirect_upstreams`` (and ``redirect_async_upstreams`` for asgi.py) points
+the app's upstream clients at the stubs without changing the URLs in ``app.py``.
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit, urlunsplit
+
+from requests.adapters import HTTPAdapter
+
+
+def news_payload(path, query, body):
+    company = query.get("q", ["company"])[0]
+    return {"status": "ok", "articles": [
+        {"title": f"{company} headline {i}", "url": f"https://news.example/{i}", "description": "..."}
+        for i in range(10)
+    ]}
+
+
+def alphavantage_payload(path, query, body):
+    function = query.get("function", [""])[0]
+    if function == "SYMBOL_SEARCH":
+        keywords = query.get("keywords", [""])[0]
+        return {"bestMatches": [{"1. symbol": keywords[:4].upper(), "2. name": f"{keywords} Inc"}]}
+    symbol = query.get("symbol", ["TEST"])[0]
+    return {"Symbol": symbol, "Name": f"{symbol} Corp", "MarketCapitalization": "1000000000", "PERatio": "20.5"}
+
+
+def worldbank_payload(path, query, body):
+    if path.startswith("/ddhxext/Search"):
+        term = query.get("qterm", [""])[0]
+        return {"Response": {"value": [
+            {"name": f"{term} report {i}", "identification": {"description": "Synthetic report"},
+             "app_legacy_url": f"https://data.example/{i}", "keywords_list": [term]}
+            for i in range(10)
+        ]}}
+    per_page = int(query.get("per_page", ["50"])[0])
+    page = int(query.get("page", ["1"])[0])
+    indicator = path.rstrip("/").rsplit("/", 1)[-1]
+    total = 2000
+    rows = [
+        {"indicator": {"id": indicator, "value": indicator}, "country": {"id": f"C{i % 200}", "value": f"Country {i % 200}"},
+         "countryiso3code": f"C{i % 200:02d}", "date": str(1960 + i // 200), "value": float(i)}
+        for i in range((page - 1) * per_page, min(page * per_page, total))
+    ]
+    return [{"page": page, "pages": -(-total // per_page), "per_page": per_page, "total": total}, rows]
+
+
+def openai_payload(path, query, body):
+    return {"choices": [{"message": {"role": "assistant", "content": "A synthetic career analysis."}}]}
+
+
+class _ThreadingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops bursts of new connections, which then wait on SYN retries.
+    request_queue_size = 1024
+
+
+class StubServer:
+    """Threaded HTTP server returning ``payload(path, query, body)`` as JSON after ``latency`` seconds."""
+
+    def __init__(self, name, payload, latency=0.05, jitter=0.0, error_rate=0.0):
+        self.name = name
+        self.payload = payload
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without this, delayed ACKs add ~40 ms.
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self):
+                stub.requests += 1
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                time.sleep(max(0.0, stub.latency + random.uniform(-stub.jitter, stub.jitter)))
+                if random.random() < stub.error_rate:
+                    status, data = 503, {"error": "stub failure"}
+                else:
+                    parts = urlsplit(self.path)
+                    status, data = 200, stub.payload(parts.path, parse_qs(parts.query), body)
+                encoded = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            do_GET = do_POST = _respond
+
+        self.server = _ThreadingServer(("127.0.0.1", 0), Handler)
+        self.address = f"127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, name=f"stub-{name}", daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+
+class RedirectAdapter(HTTPAdapter):
+    """Send every request to ``address`` over plain HTTP, keeping its path and query."""
+
+    def __init__(self, address, **kwargs):
+        self.address = address
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        request.url = urlunsplit(("http", self.address, parts.path, parts.query, ""))
+        return super().send(request, **kwargs)
+
+
+PAYLOADS = {
+    "newsapi": news_payload,
+    "alphavantage": alphavantage_payload,
+    "worldbank": worldbank_payload,
+    "openai": openai_payload,
+}
+
+
+def start_stubs(latency=0.05, jitter=0.0, error_rate=0.0):
+    """Start one stub per upstream in ``PAYLOADS``; returns ``{name: StubServer}``."""
+    return {
+        name: StubServer(name, payload, latency=latency, jitter=jitter, error_rate=error_rate)
+        for name, payload in PAYLOADS.items()
+    }
+
+
+def redirect_upstreams(upstreams, stubs):
+    """Mount a ``RedirectAdapter`` on each upstream client so its calls reach the matching stub."""
+    for name, stub in stubs.items():
+        session = upstreams[name].session
+        existing = session.get_adapter("https://")
+        adapter = RedirectAdapter(stub.address, pool_maxsize=existing._pool_maxsize,
+                                  max_retries=existing.max_retries)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+
+def redirect_async_upstreams(clients, stubs):
+    """Wrap ``send`` of each ``asgi.AsyncUpstreamClient`` so its calls reach the matching stub."""
+    for name, stub in stubs.items():
+        client = clients[name]
+
+        async def send(method, url, _send=client.send, _address=stub.address, **kwargs):
+            parts = urlsplit(url)
+            return await _send(method, urlunsplit(("http", _address, parts.path, parts.query, "")), **kwargs)
+
+        client.send = send
@@ -0,0 +1,81 @@
+"""Time local /symbol-search lookups against a synthetic listing.
+
+Builds a SymbolIndex of generated company names (about the size of the
+Alpha Vantage active listing) and reports per-query latency for symbol
+prefixes, name prefixes, misspelled names and misses.
+
+    cd server && python -m benchmarks.symbol_search --symbols 12000
+"""
+
+import argparse
+import random
+import string
+import sys
+import time
+
+from faker import Faker
+
+from symbols import SymbolIndex
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def synthetic_listing(count, seed=0):
+    fake = Faker()
+    Faker.seed(seed)
+    rng = random.Random(seed)
+    rows, seen = [], set()
+    while len(rows) < count:
+        symbol = "".join(rng.choices(string.ascii_uppercase, k=rng.randint(1, 5)))
+        if symbol in seen:
+            continue
+        seen.add(symbol)
+        rows.append((symbol, f"{fake.company()} {rng.choice(['Inc', 'Corp', 'Ltd', 'Holdings'])}"))
+    return rows
+
+
+def misspell(name, rng):
+    word = max(name.split(), key=len).strip(",.")
+    i = rng.randrange(1, len(word))
+    return word[:i] + word[i + 1:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--symbols", type=int, default=12000)
+    parser.add_argument("--queries", type=int, default=2000, help="queries per kind")
+    args = parser.parse_args()
+
+    rows = synthetic_listing(args.symbols)
+    index = SymbolIndex()
+    start = time.perf_counter()
+    index.load_rows(rows)
+    print(f"Indexed {len(index)} symbols in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    rng = random.Random(1)
+    sample = [rng.choice(rows) for _ in range(args.queries)]
+    kinds = {
+        "symbol prefix": [symbol[:2] for symbol, _ in sample],
+        "name prefix": [name[:4] for _, name in sample],
+        "misspelled": [misspell(name, rng) for _, name in sample],
+        "miss": ["".join(rng.choices("qxzj", k=6)) for _ in sample],
+    }
+
+    print(f"{'query':>14} {'found':>7} {'p50 (us)':>10} {'p99 (us)':>10}")
+    for kind, queries in kinds.items():
+        timings, found = [], 0
+        for query in queries:
+            start = time.perf_counter()
+            matches = index.search(query)
+            timings.append(time.perf_counter() - start)
+            found += bool(matches)
+        print(f"{kind:>14} {found / len(queries):>6.0%} "
+              f"{percentile(timings, 0.5) * 1e6:>10.0f} {percentile(timings, 0.99) * 1e6:>10.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
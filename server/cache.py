@@ -0,0 +1,327 @@
+# cache.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheStats:
+    """Thread-safe hit/miss/eviction counters for a cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.sets = 0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "sets": self.sets,
+            }
+
+
+def _size_of(value):
+    return len(json.dumps(value, default=str))
+
+
+class MemoryCache:
+    """In-process LRU cache bounded by entry count and approximate JSON size."""
+
+    backend = "memory"
+
+    def __init__(self, namespace, default_ttl=None, max_entries=1024, max_bytes=None, stale_ttl=0):
+        self.namespace = namespace
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        self.counters = CacheStats()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._lookup(key, allow_stale=False)
+        return entry[0] if entry else None
+
+    def get_stale(self, key):
+        """Return ``(value, is_fresh)``, including entries up to ``stale_ttl`` past their TTL."""
+        return self._lookup(key, allow_stale=True)
+
+    def expires_at(self, key):
+        """Return when ``key`` stops being fresh (``inf`` if never), or None if it is not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return entry[1] if entry[1] is not None else float("inf")
+
+    def _lookup(self, key, allow_stale):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters.incr("misses")
+                return None
+            value, expires_at, size = entry
+            fresh = expires_at is None or expires_at > now
+            if not fresh and expires_at + self.stale_ttl <= now:
+                self._remove(key)
+                self.counters.incr("expirations")
+                self.counters.incr("misses")
+                return None
+            if not fresh and not allow_stale:
+                self.counters.incr("misses")
+                return None
+            self._entries.move_to_end(key)
+        self.counters.incr("hits" if fresh else "stale_hits")
+        return value, fresh
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        size = _size_of(value) if self.max_bytes else 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            self._evict()
+        self.counters.incr("sets")
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            entries, size = len(self._entries), self._bytes
+        return {"backend": self.backend, "entries": entries, "bytes": size, **self.counters.as_dict()}
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict(self):
+        while self._entries and (
+            (self.max_entries and len(self._entries) > self.max_entries)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.counters.incr("evictions")
+
+
+class SQLiteCache:
+    """File-backed cache shared by every worker process that opens the same path.
+
+    Entries survive restarts; eviction is least-recently-used by ``accessed_at``.
+    Counters are per process, while ``entries``/``bytes`` reflect the shared file.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, namespace, path, default_ttl=None, max_entries=1024, max_bytes=None, stale_ttl=0):
+        self.namespace = namespace
+        self.path = path
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        self.counters = CacheStats()
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " expires_at REAL,"
+                " accessed_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed"
+                " ON cache_entries (namespace, accessed_at)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        entry = self._lookup(key, allow_stale=False)
+        return entry[0] if entry else None
+
+    def get_stale(self, key):
+        """Return ``(value, is_fresh)``, including entries up to ``stale_ttl`` past their TTL."""
+        return self._lookup(key, allow_stale=True)
+
+    def expires_at(self, key):
+        """Return when ``key`` stops being fresh (``inf`` if never), or None if it is not cached."""
+        row = self._connect().execute(
+            "SELECT expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0] if row[0] is not None else float("inf")
+
+    def _lookup(self, key, allow_stale):
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+        if row is None:
+            self.counters.incr("misses")
+            return None
+        value, expires_at = row
+        fresh = expires_at is None or expires_at > now
+        if not fresh and expires_at + self.stale_ttl <= now:
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ? AND expires_at <= ?",
+                (self.namespace, key, now - self.stale_ttl),
+            )
+            self.counters.incr("expirations")
+            self.counters.incr("misses")
+            return None
+        if not fresh and not allow_stale:
+            self.counters.incr("misses")
+            return None
+        conn.execute(
+            "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+            (now, self.namespace, key),
+        )
+        self.counters.incr("hits" if fresh else "stale_hits")
+        return json.loads(value), fresh
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        payload = json.dumps(value, default=str)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries"
+                " (namespace, key, value, size, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, payload, len(payload), expires_at, now),
+            )
+            evicted = self._evict(conn, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.counters.incr("sets")
+        if evicted:
+            self.counters.incr("evictions", evicted)
+
+    def delete(self, key):
+        self._connect().execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+        )
+
+    def clear(self):
+        self._connect().execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+
+    def stats(self):
+        entries, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?",
+            (self.namespace,),
+        ).fetchone()
+        return {"backend": self.backend, "entries": entries, "bytes": size, **self.counters.as_dict()}
+
+    def _evict(self, conn, now):
+        evicted = conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?",
+            (self.namespace, now - self.stale_ttl),
+        ).rowcount
+        entries, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?",
+            (self.namespace,),
+        ).fetchone()
+        while entries and (
+            (self.max_entries and entries > self.max_entries)
+            or (self.max_bytes and size > self.max_bytes)
+        ):
+            row = conn.execute(
+                "SELECT key, size FROM cache_entries WHERE namespace = ?"
+                " ORDER BY accessed_at LIMIT 1",
+                (self.namespace,),
+            ).fetchone()
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, row[0])
+            )
+            entries -= 1
+            size -= row[1]
+            evicted += 1
+        return evicted
+
+
+_caches = {}
+
+
+def make_cache(namespace, default_ttl=None, max_entries=1024, max_bytes=None, stale_ttl=0):
+    """Build a cache for ``namespace`` using the backend selected by ``CACHE_BACKEND``.
+
+    ``CACHE_BACKEND`` is ``memory`` (default) or ``sqlite``; the SQLite file is
+    ``CACHE_PATH`` (default ``cache.db``) and is shared by all workers using it.
+    Entries remain readable through ``get_stale`` for ``stale_ttl`` seconds after
+    they expire.
+    """
+    backend = os.getenv("CACHE_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        cache = SQLiteCache(
+            namespace,
+            os.getenv("CACHE_PATH", "cache.db"),
+            default_ttl=default_ttl,
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            stale_ttl=stale_ttl,
+        )
+    elif backend == "memory":
+        cache = MemoryCache(
+            namespace, default_ttl=default_ttl, max_entries=max_entries, max_bytes=max_bytes,
+            stale_ttl=stale_ttl,
+        )
+    else:
+        raise ValueError(f"Unknown CACHE_BACKEND '{backend}'")
+    _caches[namespace] = cache
+    return cache
+
+
+def cache_stats():
+    """Return the stats of every cache created through ``make_cache``."""
+    return {namespace: cache.stats() for namespace, cache in _caches.items()}
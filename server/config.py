@@ -1,16 +1,58 @@
 # config.py
 
+import os
+
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_restful import Api
 from flask_cors import CORS
-from sqlalchemy import MetaData
+from sqlalchemy import MetaData, event
 
 metadata = MetaData(naming_convention={
     "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
+    "ix": "ix_%(table_name)s_%(column_0_name)s",
 })
 
 db = SQLAlchemy(metadata=metadata)
 migrate = Migrate()
 api = Api()
 CORS = CORS
+
+
+def database_config():
+    """Flask-SQLAlchemy settings for ``DATABASE_URL`` and the ``DB_POOL_*`` variables.
+
+    Server databases such as PostgreSQL get a sized, pre-pinged pool; SQLite keeps
+    SQLAlchemy's default pool and is tuned per connection by ``configure_sqlite``.
+    """
+    url = os.getenv("DATABASE_URL", "sqlite:///app.db")
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+
+    engine_options = {}
+    if not url.startswith("sqlite"):
+        engine_options = {
+            "pool_size": int(os.getenv("DB_POOL_SIZE", 10)),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 20)),
+            "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+            "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+            "pool_pre_ping": True,
+        }
+    return {"SQLALCHEMY_DATABASE_URI": url, "SQLALCHEMY_ENGINE_OPTIONS": engine_options}
+
+
+def configure_sqlite(engine):
+    """Enable WAL, ``synchronous=NORMAL`` and a busy timeout on each new SQLite connection."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    busy_timeout_ms = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    synchronous = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {busy_timeout_ms}")
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute(f"PRAGMA synchronous = {synchronous}")
+        cursor.close()
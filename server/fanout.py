@@ -0,0 +1,142 @@
+# fanout.py
+
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+
+class FetchPool:
+    """Bounded thread pool for concurrent upstream calls.
+
+    ``max_in_flight`` caps the total number of concurrent calls and
+    ``per_host_limit`` caps how many of them may target the same host.
+    Calls over a host's limit wait in a per-host queue rather than in a pool
+    thread, so a busy host never holds threads other hosts' calls could use.
+    """
+
+    def __init__(self, max_in_flight=8, per_host_limit=4):
+        self.max_in_flight = max_in_flight
+        self.per_host_limit = per_host_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="fetch")
+        self._host_running = {}
+        self._host_pending = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, host=None, **kwargs):
+        if host is None:
+            return self._executor.submit(fn, *args, **kwargs)
+
+        task = (Future(), fn, args, kwargs)
+        with self._lock:
+            running = self._host_running.get(host, 0)
+            if running >= self.per_host_limit:
+                self._host_pending.setdefault(host, deque()).append(task)
+                return task[0]
+            self._host_running[host] = running + 1
+        self._start(host, task)
+        return task[0]
+
+    def _start(self, host, task):
+        future, fn, args, kwargs = task
+
+        def call():
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args, **kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                self._finished(host)
+
+        self._executor.submit(call)
+
+    def _finished(self, host):
+        """Hand the host's slot to its next queued call, or free it."""
+        with self._lock:
+            pending = self._host_pending.get(host)
+            if not pending:
+                self._host_running[host] -= 1
+                return
+            task = pending.popleft()
+        self._start(host, task)
+
+    def map(self, fn, items, host=None, timeout=None, default=None):
+        """Call ``fn(item)`` for every item concurrently and return results in input order.
+
+        Items whose call raises or has not finished within ``timeout`` seconds
+        get ``default``; calls that have not started are cancelled, and those
+        already running finish in the background.
+        """
+        futures = [self.submit(fn, item, host=host) for item in items]
+        wait(futures, timeout=timeout)
+
+        results = []
+        for item, future in zip(items, futures):
+            if not future.done():
+                future.cancel()
+                logger.warning("Fetch for %r timed out after %ss", item, timeout)
+                results.append(default)
+            elif future.exception() is not None:
+                logger.error("Fetch for %r failed: %s", item, future.exception())
+                results.append(default)
+            else:
+                results.append(future.result())
+        return results
+
+
+class AsyncFetchPool:
+    """``FetchPool`` limits for coroutines: calls wait on semaphores instead of holding threads.
+
+    The semaphores are created on first use, inside the event loop that runs the calls.
+    """
+
+    def __init__(self, max_in_flight=256, per_host_limit=64):
+        self.max_in_flight = max_in_flight
+        self.per_host_limit = per_host_limit
+        self._in_flight = None
+        self._host_semaphores = {}
+
+    async def call(self, fn, *args, host=None, **kwargs):
+        if self._in_flight is None:
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        if host is not None and host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        async with self._in_flight:
+            if host is None:
+                return await fn(*args, **kwargs)
+            async with self._host_semaphores[host]:
+                return await fn(*args, **kwargs)
+
+    async def map(self, fn, items, host=None, timeout=None, default=None):
+        """Await ``fn(item)`` for every item concurrently and return results in input order.
+
+        Same contract as ``FetchPool.map``: failed or unfinished calls get
+        ``default`` and unfinished ones keep running.
+        """
+        if not items:
+            return []
+        tasks = [asyncio.ensure_future(self.call(fn, item, host=host)) for item in items]
+        await asyncio.wait(tasks, timeout=timeout)
+
+        results = []
+        for item, task in zip(items, tasks):
+            if not task.done():
+                logger.warning("Fetch for %r timed out after %ss", item, timeout)
+                task.add_done_callback(_retrieve_exception)
+                results.append(default)
+            elif task.cancelled() or task.exception() is not None:
+                logger.error("Fetch for %r failed: %s", item, "cancelled" if task.cancelled() else task.exception())
+                results.append(default)
+            else:
+                results.append(task.result())
+        return results
+
+
+def _retrieve_exception(task):
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,224 @@
+# http_client.py
+
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import upstream_duration
+from ratelimit import TokenBucket, RateLimitExceeded
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 3.05))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 15))
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 16))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 2))
+RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", 0.5))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Longest Retry-After wait honoured before a retry, so a server asking for an hour cannot pin a worker.
+MAX_RETRY_AFTER = float(os.getenv("HTTP_MAX_RETRY_AFTER", 5))
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", 10))
+
+
+class UpstreamError(Exception):
+    """An upstream call failed; ``status`` is ``"error"``, ``"rate_limited"`` or ``"not_found"``."""
+
+    def __init__(self, message, status="error"):
+        super().__init__(message)
+        self.status = status
+
+
+class UpstreamRateLimited(UpstreamError, requests.exceptions.RequestException):
+    """The client-side rate limiter refused a call.
+
+    Also a ``RequestException`` so existing upstream error handling covers it.
+    """
+
+    def __init__(self, message):
+        UpstreamError.__init__(self, message, status="rate_limited")
+        self.request = None
+        self.response = None
+
+
+def rate_limiter(name, per_minute, burst, daily_quota=None):
+    """Token bucket for ``name`` configured by ``<NAME>_RATE_PER_MINUTE``, ``_BURST`` and ``_DAILY_QUOTA``.
+
+    Returns None (no limiting) when the per-minute rate is 0.
+    """
+    prefix = name.upper()
+    per_minute = float(os.getenv(f"{prefix}_RATE_PER_MINUTE", per_minute))
+    if per_minute <= 0:
+        return None
+    daily_quota = int(os.getenv(f"{prefix}_DAILY_QUOTA", daily_quota or 0)) or None
+    return TokenBucket(
+        name,
+        rate=per_minute / 60,
+        capacity=int(os.getenv(f"{prefix}_BURST", burst)),
+        daily_quota=daily_quota,
+        max_wait=RATE_LIMIT_MAX_WAIT,
+    )
+
+
+def retry_after_seconds(headers):
+    """Seconds a ``Retry-After`` header (delay or HTTP date) asks to wait, capped at ``MAX_RETRY_AFTER``.
+
+    Returns None when the header is missing or malformed.
+    """
+    value = (headers.get("Retry-After") or "").strip()
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return None
+    return min(max(0.0, seconds), MAX_RETRY_AFTER)
+
+
+class CappedRetry(Retry):
+    """``Retry`` that waits at most ``MAX_RETRY_AFTER`` seconds for a ``Retry-After`` header."""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, MAX_RETRY_AFTER)
+
+
+class UpstreamStats:
+    """Call count, error count and latency totals for one upstream."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, elapsed, error=False):
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "total_seconds": round(self.total_seconds, 6),
+                "avg_seconds": round(self.total_seconds / self.requests, 6) if self.requests else 0.0,
+                "max_seconds": round(self.max_seconds, 6),
+            }
+
+
+class UpstreamClient:
+    """Keep-alive session for one upstream API with timeouts, retries and latency stats.
+
+    Retries use exponential backoff on connection errors and on ``retry_statuses``
+    (honouring ``Retry-After`` up to ``MAX_RETRY_AFTER``); once retries are exhausted the last response is
+    returned so callers can keep checking ``status_code``. With a ``limiter``, every
+    attempt, retries included, first takes a token and raises ``UpstreamRateLimited``
+    if none is granted, so the daily quota counts each request the upstream sees.
+    """
+
+    def __init__(self, name, timeout=None, max_retries=MAX_RETRIES, retry_methods=("GET",),
+                 retry_statuses=RETRY_STATUSES, pool_maxsize=POOL_MAXSIZE, limiter=None):
+        self.name = name
+        self.timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+        self.limiter = limiter
+        self.stats = UpstreamStats()
+        self.retry = CappedRetry(
+            total=max_retries,
+            backoff_factor=RETRY_BACKOFF,
+            status_forcelist=retry_statuses,
+            allowed_methods=frozenset(retry_methods),
+            raise_on_status=False,
+        )
+        # Rate-limited clients retry in ``_send`` so each attempt is charged a token.
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize,
+                              max_retries=self.retry if limiter is None else 0)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _acquire(self):
+        if self.limiter is not None:
+            try:
+                self.limiter.acquire()
+            except RateLimitExceeded as e:
+                raise UpstreamRateLimited(str(e)) from e
+
+    def request(self, method, url, **kwargs):
+        self._acquire()
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        error = True
+        try:
+            response = self._send(method, url, **kwargs)
+            error = response.status_code >= 400
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stats.record(elapsed, error=error)
+            upstream_duration.observe(elapsed, self.name, urlsplit(url).hostname or "", "error" if error else "ok")
+
+    def _send(self, method, url, **kwargs):
+        if self.limiter is None:
+            return self.session.request(method, url, **kwargs)
+
+        retry = self.retry
+        retries = retry.total if method in retry.allowed_methods else 0
+        for attempt in range(retries + 1):
+            if attempt:
+                self._acquire()
+            backoff = retry.backoff_factor * 2 ** attempt
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == retries:
+                    raise
+                time.sleep(backoff)
+                continue
+            if attempt == retries or response.status_code not in retry.status_forcelist:
+                return response
+            response.close()
+            wait = retry_after_seconds(response.headers)
+            time.sleep(backoff if wait is None else wait)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+# Defaults match the free tiers: NewsAPI allows 100 calls a day, Alpha Vantage 5 a minute and 25 a day.
+newsapi = UpstreamClient("newsapi", limiter=rate_limiter("newsapi", per_minute=60, burst=10, daily_quota=100))
+alphavantage = UpstreamClient(
+    "alphavantage", limiter=rate_limiter("alphavantage", per_minute=5, burst=5, daily_quota=25)
+)
+worldbank = UpstreamClient("worldbank")
+# Chat completions are paid for, so only retry statuses where OpenAI did not run the request.
+openai_api = UpstreamClient(
+    "openai",
+    timeout=(CONNECT_TIMEOUT, float(os.getenv("OPENAI_READ_TIMEOUT", 120))),
+    retry_methods=("POST",),
+    retry_statuses=(429, 503),
+)
+
+UPSTREAMS = {client.name: client for client in (newsapi, alphavantage, worldbank, openai_api)}
+
+
+def upstream_stats():
+    stats = {}
+    for name, client in UPSTREAMS.items():
+        stats[name] = client.stats.as_dict()
+        if client.limiter is not None:
+            stats[name]["rate_limit"] = client.limiter.stats()
+    return stats
@@ -0,0 +1,268 @@
+# jobs.py
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+
+from metrics import job_duration, job_queue_wait, jobs_total
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+class RetryableJobError(Exception):
+    """Raised by a job handler when the job may succeed if run again later."""
+
+
+class JobQueue:
+    """Durable job queue in a SQLite file, shared by every worker process that opens the same path.
+
+    A claimed job is leased for ``lease_seconds``; if its worker dies without
+    finishing it, the job is claimed again once the lease runs out.
+    """
+
+    def __init__(self, path, lease_seconds=600, max_attempts=3, retry_backoff=5.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _create_schema(self, conn):
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " kind TEXT NOT NULL,"
+                " user_id TEXT,"
+                " dedupe_key TEXT,"
+                " payload TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " result TEXT,"
+                " error TEXT,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " created_at REAL NOT NULL,"
+                " available_at REAL NOT NULL,"
+                " started_at REAL,"
+                " finished_at REAL,"
+                " lease_expires_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_claim ON jobs (status, available_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_user ON jobs (user_id, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_dedupe ON jobs (kind, dedupe_key, created_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # Created on first use, so importing the app for tooling does not create the file.
+            with self._schema_lock:
+                if not self._schema_ready:
+                    self._create_schema(conn)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, kind, payload, user_id=None, dedupe_key=None, reuse_within=None):
+        """Queue a job and return ``(job, created)``.
+
+        Unless ``reuse_within`` is None, the job ``find`` returns for ``dedupe_key``
+        is returned instead of queueing a new one.
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if dedupe_key is not None and reuse_within is not None:
+                existing = self.find(kind, dedupe_key, reuse_within)
+                if existing is not None:
+                    conn.execute("COMMIT")
+                    return existing, False
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, kind, user_id, dedupe_key, payload, status, created_at, available_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, user_id, dedupe_key, json.dumps(payload), QUEUED, now, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(job_id), True
+
+    def find(self, kind, dedupe_key, reuse_within):
+        """Return the newest ``kind`` job for ``dedupe_key`` that is queued, running, or succeeded
+        within the last ``reuse_within`` seconds, or None."""
+        row = self._connect().execute(
+            "SELECT * FROM jobs WHERE kind = ? AND dedupe_key = ? AND status != ?"
+            " AND (status != ? OR finished_at >= ?) ORDER BY created_at DESC LIMIT 1",
+            (kind, dedupe_key, FAILED, SUCCEEDED, time.time() - reuse_within),
+        ).fetchone()
+        return _job(row) if row is not None else None
+
+    def claim(self):
+        """Lease the oldest runnable job to the caller and return it, or None if there is none."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # A job whose worker keeps dying (or taking longer than its lease) is not retried forever.
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_expires_at = NULL"
+                " WHERE status = ? AND lease_expires_at < ? AND attempts >= ?",
+                (FAILED, "Job did not finish within its lease", now, RUNNING, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at < ?)"
+                " ORDER BY available_at LIMIT 1",
+                (QUEUED, now, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, lease_expires_at = ?"
+                " WHERE id = ?",
+                (RUNNING, now, now + self.lease_seconds, row["id"]),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        job = _job(row)
+        job.update(status=RUNNING, attempts=job["attempts"] + 1, started_at=now)
+        return job
+
+    # complete and fail only apply to the attempt that still holds the job: once a lease
+    # runs out and the job is claimed again, ``attempts`` no longer matches and the late
+    # worker's outcome is dropped. They return the new status, or None if it was dropped.
+
+    def complete(self, job_id, result, attempts):
+        updated = self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = NULL, finished_at = ?, lease_expires_at = NULL"
+            " WHERE id = ? AND status = ? AND attempts = ?",
+            (SUCCEEDED, json.dumps(result), time.time(), job_id, RUNNING, attempts),
+        ).rowcount
+        return SUCCEEDED if updated else None
+
+    def fail(self, job_id, error, attempts, retryable=False):
+        """Mark a job failed, or queue it again after a backoff if it is retryable and has attempts left."""
+        now = time.time()
+        if retryable and attempts < self.max_attempts:
+            status, sql, params = QUEUED, "available_at = ?", (now + self.retry_backoff * 2 ** (attempts - 1),)
+        else:
+            status, sql, params = FAILED, "finished_at = ?", (now,)
+        updated = self._connect().execute(
+            f"UPDATE jobs SET status = ?, error = ?, {sql}, lease_expires_at = NULL"
+            " WHERE id = ? AND status = ? AND attempts = ?",
+            (status, error) + params + (job_id, RUNNING, attempts),
+        ).rowcount
+        return status if updated else None
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row) if row is not None else None
+
+    def for_user(self, user_id, limit=20):
+        rows = self._connect().execute(
+            "SELECT * FROM jobs WHERE user_id = ? ORDER BY created_at DESC LIMIT ?", (user_id, limit)
+        ).fetchall()
+        return [_job(row) for row in rows]
+
+    def purge(self, older_than):
+        """Delete finished jobs that ended more than ``older_than`` seconds ago; returns how many."""
+        return self._connect().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+            (SUCCEEDED, FAILED, time.time() - older_than),
+        ).rowcount
+
+
+def _job(row):
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+    return job
+
+
+class WorkerPool:
+    """Threads that claim jobs from a ``JobQueue`` and run the handler registered for their kind.
+
+    ``workers`` bounds how many jobs this process runs at once. Idle workers
+    poll every ``poll_interval`` seconds, or wake at once on ``notify``.
+    """
+
+    def __init__(self, queue, handlers, workers=2, poll_interval=2.0):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Condition()
+        self._pending_wakeups = 0
+        self._threads = []
+
+    @property
+    def started(self):
+        return bool(self._threads)
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def notify(self):
+        with self._wakeup:
+            self._pending_wakeups += 1
+            self._wakeup.notify()
+
+    def _wait(self):
+        with self._wakeup:
+            if not self._pending_wakeups:
+                self._wakeup.wait(self.poll_interval)
+            self._pending_wakeups = max(0, self._pending_wakeups - 1)
+
+    def _run(self):
+        # A failure anywhere in one iteration is logged and the loop carries on; an
+        # unfinished job keeps its lease and is claimed again once the lease expires.
+        while True:
+            try:
+                job = self.queue.claim()
+                if job is None:
+                    self._wait()
+                    continue
+                self.run(job)
+            except Exception:
+                logger.exception("Job worker iteration failed")
+                self._wait()
+
+    def run(self, job):
+        handler = self.handlers.get(job["kind"])
+        job_queue_wait.observe(max(0.0, job["started_at"] - job["available_at"]), job["kind"])
+        start = time.perf_counter()
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for job kind {job['kind']!r}")
+            result = handler(job["payload"])
+        except RetryableJobError as e:
+            outcome = self.queue.fail(job["id"], str(e), job["attempts"], retryable=True)
+            logger.warning("Job %s attempt %s failed: %s", job["id"], job["attempts"], e)
+        except Exception as e:
+            outcome = self.queue.fail(job["id"], str(e), job["attempts"])
+            logger.exception("Job %s failed", job["id"])
+        else:
+            outcome = self.queue.complete(job["id"], result, job["attempts"])
+        job_duration.observe(time.perf_counter() - start, job["kind"])
+        if outcome is None:
+            logger.warning("Job %s attempt %s outlived its lease; its outcome was dropped", job["id"], job["attempts"])
+            outcome = "expired"
+        jobs_total.inc(job["kind"], outcome)
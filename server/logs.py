@@ -0,0 +1,135 @@
+# logs.py
+
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import reprlib
+import sys
+import uuid
+
+from flask import g, has_request_context, request
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Per-logger overrides, e.g. "app=DEBUG,urllib3=WARNING".
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_MAX_CHARS = int(os.getenv("LOG_MAX_CHARS", 2000))
+# Fraction of payload logs (see ``log_payload``) that are emitted when their level is enabled.
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", 0.01))
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_valid_request_id = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+# Request id for work outside a Flask request, such as the async routes in asgi.py.
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+_payload_repr = reprlib.Repr()
+_payload_repr.maxlevel = 4
+_payload_repr.maxlist = _payload_repr.maxtuple = _payload_repr.maxdict = 10
+_payload_repr.maxstring = _payload_repr.maxother = 200
+
+
+class Truncated:
+    """Wrap a log argument so it is rendered, size-limited, only if the record is emitted."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        if isinstance(self.value, str):
+            return _payload_repr.repr(self.value)[1:-1]
+        return _payload_repr.repr(self.value)
+
+
+def log_payload(logger, message, *args, level=logging.DEBUG):
+    """Log a message about large values, sampled at ``LOG_PAYLOAD_SAMPLE_RATE`` and truncated.
+
+    Nothing is rendered unless ``level`` is enabled for ``logger`` and the call is sampled.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if LOG_PAYLOAD_SAMPLE_RATE < 1 and random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    logger.log(level, message, *(Truncated(arg) for arg in args), stacklevel=2)
+
+
+def current_request_id():
+    if has_request_context():
+        return g.get("request_id", "-")
+    return request_id_var.get()
+
+
+def resolve_request_id(header_value):
+    """Return ``header_value`` if it is a usable request id, else a new random one."""
+    header_value = header_value or ""
+    return header_value if _valid_request_id.match(header_value) else uuid.uuid4().hex
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = current_request_id()
+        return True
+
+
+def _truncate(text):
+    if len(text) <= LOG_MAX_CHARS:
+        return text
+    return f"{text[:LOG_MAX_CHARS]}... [{len(text) - LOG_MAX_CHARS} more chars]"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with time, level, logger, request id and message."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": _truncate(record.getMessage()),
+        }
+        if record.exc_info:
+            entry["exc"] = _truncate(self.formatException(record.exc_info))
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def formatMessage(self, record):
+        record.message = _truncate(record.message)
+        return super().formatMessage(record)
+
+
+def configure_logging():
+    """Install the root handler and apply ``LOG_LEVEL`` and ``LOG_LEVELS``; safe to call more than once."""
+    root = logging.getLogger()
+    if any(isinstance(f, RequestIdFilter) for handler in root.handlers for f in handler.filters):
+        return
+    handler = logging.StreamHandler(sys.stderr)
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    for override in LOG_LEVELS.split(","):
+        name, _, level = override.partition("=")
+        if name.strip() and level.strip():
+            logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+
+def init_app(app):
+    """Give every request an id, taken from ``X-Request-ID`` when the client sends one."""
+
+    @app.before_request
+    def assign_request_id():
+        g.request_id = resolve_request_id(request.headers.get(REQUEST_ID_HEADER))
+
+    @app.after_request
+    def echo_request_id(response):
+        response.headers[REQUEST_ID_HEADER] = g.get("request_id", "-")
+        return response
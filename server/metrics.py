@@ -0,0 +1,191 @@
+# metrics.py
+
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+# Latency buckets in seconds, from cache hits up to slow upstream calls.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels, rendered in Prometheus text format."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            yield self.name, _labels(self.label_names, label_values), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in Prometheus text format.
+
+    Observations only increment one bucket under a lock; the cumulative counts
+    are computed when rendering.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            snapshot = sorted((labels, (list(counts), total, count))
+                              for labels, (counts, total, count) in self._series.items())
+        for label_values, (counts, total, count) in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket", _labels(self.label_names, label_values, (le,)), cumulative
+            yield f"{self.name}_sum", _labels(self.label_names, label_values), total
+            yield f"{self.name}_count", _labels(self.label_names, label_values), count
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time to handle a request, until its response headers are ready.",
+    ("method", "route", "status"),
+)
+request_queries = registry.histogram(
+    "http_request_sql_queries", "SQL statements executed per request.",
+    ("method", "route"), buckets=QUERY_COUNT_BUCKETS,
+)
+request_sql_duration = registry.histogram(
+    "http_request_sql_duration_seconds", "Time spent executing SQL per request.", ("method", "route"),
+)
+sql_queries = registry.counter(
+    "sql_queries_total", "SQL statements executed, inside or outside a request.", ("context",),
+)
+upstream_duration = registry.histogram(
+    "upstream_request_duration_seconds", "Time spent on outbound API calls, including retries.",
+    ("upstream", "host", "outcome"),
+)
+
+jobs_total = registry.counter(
+    "jobs_total", "Background jobs run, by outcome: succeeded, failed, queued for a retry, or expired (lease lost).", ("kind", "outcome"),
+)
+job_queue_wait = registry.histogram(
+    "job_queue_wait_seconds", "Time from a job becoming runnable to a worker starting it.", ("kind",),
+    buckets=LATENCY_BUCKETS + (60, 300, 900),
+)
+job_duration = registry.histogram(
+    "job_duration_seconds", "Time spent running a background job.", ("kind",),
+)
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def init_app(app):
+    """Record per-route latency and per-request SQL counts for ``app``."""
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+
+    @app.after_request
+    def record_request(response):
+        start = g.get("metrics_start")
+        if start is not None:
+            method, route = request.method, _route()
+            request_duration.observe(time.perf_counter() - start, method, route, str(response.status_code))
+            request_queries.observe(g.sql_queries, method, route)
+            request_sql_duration.observe(g.sql_seconds, method, route)
+        return response
+
+
+def instrument_engine(engine):
+    """Count and time every statement ``engine`` runs, attributing it to the current request if any."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def end_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+        if has_request_context() and "sql_queries" in g:
+            g.sql_queries += 1
+            g.sql_seconds += elapsed
+            sql_queries.inc("request")
+        else:
+            sql_queries.inc("background")
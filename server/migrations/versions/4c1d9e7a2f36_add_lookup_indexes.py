@@ -0,0 +1,43 @@
+"""Add lookup indexes and unique favorites constraint
+
+Revision ID: 4c1d9e7a2f36
+Revises: b886fb81cfa1
+Create Date: 2026-10-18 09:12:44.301927
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '4c1d9e7a2f36'
+down_revision = 'b886fb81cfa1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+
+    op.create_index('ix_companies_category_id', 'companies', ['category_id'])
+    op.create_index('ix_companies_user_id', 'companies', ['user_id'])
+    op.create_index('ix_favorites_company_id', 'favorites', ['company_id'])
+    op.create_index('ix_users_name', 'users', ['name'])
+
+    # Keep the oldest row of any duplicated favorite so the unique constraint can be added.
+    op.execute(
+        "DELETE FROM favorites WHERE id NOT IN "
+        "(SELECT MIN(id) FROM favorites GROUP BY user_id, company_id)"
+    )
+
+    with op.batch_alter_table('favorites', schema=None) as batch_op:
+        # Its leading user_id column also covers lookups by user_id alone.
+        batch_op.create_unique_constraint('uq_favorites_user_id_company_id', ['user_id', 'company_id'])
+
+
+def downgrade():
+
+    with op.batch_alter_table('favorites', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_favorites_user_id_company_id', type_='unique')
+
+    op.drop_index('ix_users_name', table_name='users')
+    op.drop_index('ix_favorites_company_id', table_name='favorites')
+    op.drop_index('ix_companies_user_id', table_name='companies')
+    op.drop_index('ix_companies_category_id', table_name='companies')
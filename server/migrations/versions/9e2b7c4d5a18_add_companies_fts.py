@@ -0,0 +1,65 @@
+"""Add companies_fts full-text index kept in sync by triggers
+
+Revision ID: 9e2b7c4d5a18
+Revises: 4c1d9e7a2f36
+Create Date: 2026-10-18 16:02:17.540113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '9e2b7c4d5a18'
+down_revision = '4c1d9e7a2f36'
+branch_labels = None
+depends_on = None
+
+CATEGORY_NAME = "(SELECT name FROM categories WHERE id = new.category_id)"
+
+
+def upgrade():
+    # FTS5 is SQLite-only; other databases fall back to LIKE matching in search.py.
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute(
+        "CREATE VIRTUAL TABLE companies_fts USING fts5("
+        "name, link, category, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    op.execute(
+        "INSERT INTO companies_fts (rowid, name, link, category) "
+        "SELECT companies.id, companies.name, companies.link, categories.name "
+        "FROM companies LEFT JOIN categories ON categories.id = companies.category_id"
+    )
+
+    # Triggers keep the index in step with every write path, including bulk inserts from seed.py.
+    op.execute(
+        "CREATE TRIGGER companies_fts_insert AFTER INSERT ON companies BEGIN "
+        "INSERT INTO companies_fts (rowid, name, link, category) "
+        f"VALUES (new.id, new.name, new.link, {CATEGORY_NAME}); END"
+    )
+    op.execute(
+        "CREATE TRIGGER companies_fts_update AFTER UPDATE OF id, name, link, category_id ON companies BEGIN "
+        "DELETE FROM companies_fts WHERE rowid = old.id; "
+        "INSERT INTO companies_fts (rowid, name, link, category) "
+        f"VALUES (new.id, new.name, new.link, {CATEGORY_NAME}); END"
+    )
+    op.execute(
+        "CREATE TRIGGER companies_fts_delete AFTER DELETE ON companies BEGIN "
+        "DELETE FROM companies_fts WHERE rowid = old.id; END"
+    )
+    op.execute(
+        "CREATE TRIGGER categories_fts_update AFTER UPDATE OF name ON categories BEGIN "
+        "UPDATE companies_fts SET category = new.name "
+        "WHERE rowid IN (SELECT id FROM companies WHERE category_id = new.id); END"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS categories_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS companies_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS companies_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS companies_fts_insert")
+    op.execute("DROP TABLE IF EXISTS companies_fts")
@@ -1,7 +1,7 @@
 from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, joinedload
 from config import db
-import bcrypt
+import passwords
 
 class Category(db.Model):
     __tablename__ = 'categories'
@@ -22,8 +22,8 @@ class Company(db.Model):
     link = db.Column(db.String)
     indeed = db.Column(db.String)
     
-    category_id = db.Column(db.Integer, ForeignKey('categories.id'))
-    user_id = db.Column(db.Integer, ForeignKey('users.id'), nullable=False)
+    category_id = db.Column(db.Integer, ForeignKey('categories.id'), index=True)
+    user_id = db.Column(db.Integer, ForeignKey('users.id'), nullable=False, index=True)
     
     category = relationship('Category', back_populates='companies')
     user = relationship('User', back_populates='companies')
@@ -36,7 +36,7 @@ class User(db.Model):
     __tablename__ = 'users'
     
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(100), nullable=False, index=True)
     password_hash = db.Column(db.String(200), nullable=False)
 
     favorites = relationship('Favorites', back_populates='user', cascade="all, delete-orphan")
@@ -48,18 +48,34 @@ class User(db.Model):
 
     def hash_password(self, password):
         """Hash the password using bcrypt."""
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        return passwords.hash_password(password)
 
     def check_password(self, password):
         """Check if the provided password matches the stored hash."""
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        return passwords.check_password(password, self.password_hash)
+
+    def password_needs_rehash(self):
+        """Check if the stored hash was made with a different bcrypt cost than configured."""
+        return passwords.needs_rehash(self.password_hash)
+
+    @staticmethod
+    def with_favorites(user_id):
+        """Return the user with their favorites, companies and categories loaded in one query."""
+        return (User.query
+                .options(joinedload(User.favorites).joinedload(Favorites.company).joinedload(Company.category))
+                .filter_by(id=user_id)
+                .first())
 
 class Favorites(db.Model):
     __tablename__ = 'favorites'
+    # The unique (user_id, company_id) index also serves lookups by user_id alone.
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'company_id', name='uq_favorites_user_id_company_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, ForeignKey('users.id'))
-    company_id = db.Column(db.Integer, ForeignKey('companies.id'))
+    company_id = db.Column(db.Integer, ForeignKey('companies.id'), index=True)
     
     user = relationship('User', back_populates='favorites')
     company = relationship('Company', back_populates='favorites')
@@ -0,0 +1,65 @@
+# passwords.py
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# bcrypt releases the GIL while hashing, so a thread pool runs hashes in parallel without
+# forking a process that already has request, refresher and job threads. 0 hashes inline.
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", min(4, os.cpu_count() or 1)))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", 64))
+PASSWORD_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_QUEUE_TIMEOUT", 10))
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when too many password operations are already queued."""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(PASSWORD_MAX_PENDING)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt")
+        return _executor
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(password, password_hash):
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+def _run(fn, *args):
+    if PASSWORD_WORKERS == 0:
+        return fn(*args)
+    if not _pending.acquire(timeout=PASSWORD_QUEUE_TIMEOUT):
+        raise PasswordPoolBusy("Too many password operations in progress")
+    try:
+        return _get_executor().submit(fn, *args).result()
+    finally:
+        _pending.release()
+
+
+def hash_password(password, rounds=None):
+    """Hash ``password`` with bcrypt at ``rounds`` (default ``BCRYPT_ROUNDS``) in the password pool."""
+    return _run(_hash, password, rounds or BCRYPT_ROUNDS)
+
+
+def check_password(password, password_hash):
+    """Check ``password`` against a bcrypt hash in the password pool."""
+    return _run(_check, password, password_hash)
+
+
+def needs_rehash(password_hash, rounds=None):
+    """Return True if ``password_hash`` was made with a different work factor than configured."""
+    return int(password_hash.split('$')[2]) != (rounds or BCRYPT_ROUNDS)
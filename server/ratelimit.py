@@ -0,0 +1,163 @@
+# ratelimit.py
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_priority = threading.local()
+
+
+def current_priority():
+    return getattr(_priority, "value", INTERACTIVE)
+
+
+@contextmanager
+def background_priority():
+    """Mark upstream calls made by this thread as background work, queued behind interactive ones."""
+    previous = current_priority()
+    _priority.value = BACKGROUND
+    try:
+        yield
+    finally:
+        _priority.value = previous
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call cannot get a token within its wait limit or the daily quota is spent."""
+
+
+class TokenBucket:
+    """Token bucket with a priority wait queue and an optional daily quota.
+
+    ``rate`` tokens per second refill the bucket up to ``capacity``. Waiting callers
+    are served lowest priority value first, then in arrival order.
+    """
+
+    def __init__(self, name, rate, capacity, daily_quota=None, max_wait=10.0):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.daily_quota = daily_quota
+        self.max_wait = max_wait
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._day = None
+        self._used_today = 0
+        self._queue = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self.acquired = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_observed_wait = 0.0
+
+    def acquire(self, priority=None):
+        """Take one token, waiting up to ``max_wait`` seconds; returns the time spent waiting."""
+        priority = current_priority() if priority is None else priority
+        start = time.monotonic()
+        deadline = start + self.max_wait
+        ticket = (priority, next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    self._refill()
+                    wait_for = None
+                    if self._queue[0] == ticket:
+                        self._check_quota(ticket)
+                        if self._tokens >= 1:
+                            heapq.heappop(self._queue)
+                            self._tokens -= 1
+                            self._used_today += 1
+                            break
+                        wait_for = (1 - self._tokens) / self.rate
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject(ticket)
+                        raise RateLimitExceeded(f"{self.name} rate limit: no token within {self.max_wait}s")
+                    self._cond.wait(remaining if wait_for is None else min(remaining, wait_for))
+            finally:
+                # Let the next caller in line re-check the bucket.
+                self._cond.notify_all()
+
+            return self._record(time.monotonic() - start)
+
+    async def acquire_async(self, priority=None):
+        """``acquire`` for coroutines: sleeps with ``asyncio.sleep`` instead of blocking a thread.
+
+        Threads already queued with the same or a higher priority are served first;
+        waiting coroutines are not queued and take tokens in no particular order.
+        """
+        priority = current_priority() if priority is None else priority
+        start = time.monotonic()
+        deadline = start + self.max_wait
+        while True:
+            with self._cond:
+                self._refill()
+                self._roll_day()
+                if self.daily_quota and self._used_today >= self.daily_quota:
+                    self.rejected += 1
+                    raise RateLimitExceeded(f"{self.name} daily quota of {self.daily_quota} calls is used up")
+                if self._tokens >= 1 and not (self._queue and self._queue[0][0] <= priority):
+                    self._tokens -= 1
+                    self._used_today += 1
+                    return self._record(time.monotonic() - start)
+                # With a full token, a queued thread is about to take it; check again shortly.
+                wait_for = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.01
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.rejected += 1
+                    raise RateLimitExceeded(f"{self.name} rate limit: no token within {self.max_wait}s")
+            await asyncio.sleep(min(remaining, wait_for))
+
+    def _record(self, waited):
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_observed_wait = max(self.max_observed_wait, waited)
+        return waited
+
+    def stats(self):
+        with self._cond:
+            self._refill()
+            self._roll_day()
+            return {
+                "tokens": round(self._tokens, 3),
+                "capacity": self.capacity,
+                "rate_per_minute": round(self.rate * 60, 3),
+                "daily_quota": self.daily_quota,
+                "remaining_today": (self.daily_quota - self._used_today) if self.daily_quota else None,
+                "queued": len(self._queue),
+                "acquired": self.acquired,
+                "rejected": self.rejected,
+                "avg_wait_seconds": round(self.total_wait / self.acquired, 6) if self.acquired else 0.0,
+                "max_wait_seconds": round(self.max_observed_wait, 6),
+            }
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _roll_day(self):
+        today = datetime.now(timezone.utc).date()
+        if today != self._day:
+            self._day = today
+            self._used_today = 0
+
+    def _check_quota(self, ticket):
+        self._roll_day()
+        if self.daily_quota and self._used_today >= self.daily_quota:
+            self._reject(ticket)
+            raise RateLimitExceeded(f"{self.name} daily quota of {self.daily_quota} calls is used up")
+
+    def _reject(self, ticket):
+        self._queue.remove(ticket)
+        heapq.heapify(self._queue)
+        self.rejected += 1
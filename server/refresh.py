@@ -0,0 +1,69 @@
+# refresh.py
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ratelimit import background_priority
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundRefresher:
+    """Run cache refreshes off the request path, at most one pending refresh per key.
+
+    Refreshes run at background priority, so rate-limited upstreams serve
+    interactive requests first.
+    """
+
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="refresh")
+        self._pending = set()
+        self._lock = threading.Lock()
+        self.scheduled = 0
+
+    def refresh(self, key, fn, *args, **kwargs):
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+            self.scheduled += 1
+
+        def run():
+            try:
+                with background_priority():
+                    fn(*args, **kwargs)
+            except Exception as e:
+                logger.error("Background refresh of %r failed: %s", key, e)
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+
+        self._executor.submit(run)
+        return True
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+
+class PeriodicJob(threading.Thread):
+    """Daemon thread that calls ``job`` every ``interval`` seconds until stopped."""
+
+    def __init__(self, interval, job, name="periodic-job"):
+        super().__init__(name=name, daemon=True)
+        self.interval = interval
+        self.job = job
+        self._stopped = threading.Event()
+
+    def run(self):
+        while True:
+            try:
+                self.job()
+            except Exception as e:
+                logger.error("%s failed: %s", self.name, e)
+            if self._stopped.wait(self.interval):
+                return
+
+    def stop(self):
+        self._stopped.set()
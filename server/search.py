@@ -0,0 +1,69 @@
+# search.py
+
+import re
+
+from sqlalchemy import case, inspect, or_, text
+
+from models import Category, Company
+
+# bm25 column weights for companies_fts (name, link, category): name matches rank highest.
+FTS_WEIGHTS = (10.0, 1.0, 3.0)
+
+_terms = re.compile(r"\w+", re.UNICODE)
+_fts_available = {}
+
+
+def search_terms(query):
+    return _terms.findall(query.lower())
+
+
+def fts_query(terms):
+    """Build an FTS5 MATCH expression requiring every term, each as a prefix."""
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def has_fts(session):
+    # Only a found index is remembered, so one created by a later migration is picked up.
+    engine = session.get_bind()
+    if engine.url not in _fts_available:
+        if engine.dialect.name != "sqlite" or not inspect(engine).has_table("companies_fts"):
+            return False
+        _fts_available[engine.url] = True
+    return True
+
+
+def search_companies(session, query, limit, offset=0):
+    """Return up to ``limit`` ``(id, name, category, link, indeed, user_id)`` rows matching ``query``, best first.
+
+    Uses the ``companies_fts`` index ranked by bm25 when it exists, otherwise a
+    case-insensitive substring scan that ranks name matches above link and
+    category matches.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    if has_fts(session):
+        weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+        return session.execute(text(
+            "SELECT companies.id, companies.name, categories.name, companies.link,"
+            " companies.indeed, companies.user_id"
+            " FROM companies_fts"
+            " JOIN companies ON companies.id = companies_fts.rowid"
+            " LEFT JOIN categories ON categories.id = companies.category_id"
+            f" WHERE companies_fts MATCH :match"
+            f" ORDER BY bm25(companies_fts, {weights}), companies.id"
+            " LIMIT :limit OFFSET :offset"
+        ), {"match": fts_query(terms), "limit": limit, "offset": offset}).all()
+
+    name_matches = sum(case((Company.name.ilike(f"%{term}%"), 1), else_=0) for term in terms)
+    return (session.query(Company.id, Company.name, Category.name, Company.link,
+                          Company.indeed, Company.user_id)
+            .outerjoin(Company.category)
+            .filter(*(or_(Company.name.ilike(f"%{term}%"), Company.link.ilike(f"%{term}%"),
+                          Category.name.ilike(f"%{term}%"))
+                      for term in terms))
+            .order_by(name_matches.desc(), Company.id)
+            .limit(limit)
+            .offset(offset)
+            .all())
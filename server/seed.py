@@ -1,74 +1,165 @@
+import argparse
 import json
+import random
+
+from sqlalchemy import insert
+
 from app import db, create_app
 from models import Company, Category, Favorites, User
+from passwords import hash_password
+
+SEED_USERS = ["Ethan", "Recruiter", "Sara", "William"]
+SEED_PASSWORD = "password-123$"
+FAVORITES_PER_USER = 3
+BATCH_SIZE = 1000
+
+
+def iter_json_array(path, chunk_size=64 * 1024):
+    """Yield the items of a top-level JSON array one at a time without loading the whole file."""
+    decoder = json.JSONDecoder()
+    with open(path, "r") as file:
+        buffer = file.read(chunk_size)
+        while buffer.isspace():
+            buffer = file.read(chunk_size)
+        buffer = buffer.lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} does not contain a JSON array")
+        buffer = buffer[1:]
+        eof = False
+        while True:
+            buffer = buffer.lstrip().lstrip(",").lstrip()
+            if buffer.startswith("]"):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+                # A scalar cut by a chunk boundary can still decode ("1." as 1, "12" of 123),
+                # so an item is only complete once a separator after it has been read.
+                separator = buffer[end:].lstrip()[:1]
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                separator = ""
+            if separator not in (",", "]"):
+                if eof:
+                    raise ValueError(f"{path} is not a well-formed JSON array")
+                chunk = file.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield item
+            buffer = buffer[end:]
+
+
+def synthetic_companies(count, category_count=20, seed=0):
+    """Generate ``count`` fake companies spread over ``category_count`` categories; the same ``seed`` gives the same companies."""
+    from faker import Faker
+
+    fake = Faker()
+    fake.seed_instance(seed)
+    rng = random.Random(seed)
+    categories = [f"{fake.unique.word().title()}Sector" for _ in range(category_count)]
+    # Faker is the bottleneck at this scale, so reuse a pool of names with a numeric suffix.
+    names = [fake.company() for _ in range(min(count, 2000))]
+    for i in range(count):
+        name = names[i % len(names)]
+        if i >= len(names):
+            name = f"{name} {i // len(names)}"
+        slug = "-".join(name.lower().replace(",", "").split())
+        yield {
+            "name": name,
+            "category": rng.choice(categories),
+            "link": f"https://www.linkedin.com/company/{slug}/jobs/",
+            "indeed": f"https://www.indeed.com/cmp/{slug}",
+        }
+
+
+def synthetic_user_names(count):
+    from faker import Faker
+
+    fake = Faker()
+    fake.seed_instance(1)
+    return [fake.unique.user_name() for _ in range(count)]
+
 
-with open("companies.json", "r") as file:
-    companies_data = json.load(file)
+def seed(companies, user_names, random_seed=0):
+    """Replace all data with ``companies`` and ``user_names`` in a single transaction.
 
-app = create_app()
-with app.app_context():
-    
+    Companies are assigned to users at random, reproducibly for a given ``random_seed``.
+    """
+    rng = random.Random(random_seed)
+    Favorites.query.delete()
     Company.query.delete()
     Category.query.delete()
-    Favorites.query.delete()
     User.query.delete()
-    db.session.commit()
 
-    
-    categories_data = set(company["category"] for company in companies_data)
-    for category_name in categories_data:
-        existing_category = Category.query.filter_by(name=category_name).first()
-        if not existing_category:
-            new_category = Category(name=category_name)
-            db.session.add(new_category)
+    # Every seeded user shares the same password, so it only needs hashing once.
+    password_hash = hash_password(SEED_PASSWORD)
+    db.session.execute(insert(User), [{"name": name, "password_hash": password_hash} for name in user_names])
+    user_ids = [user_id for (user_id,) in db.session.query(User.id)]
 
-    db.session.commit()
+    category_ids = {}
+    batch = []
+    company_count = 0
+    for company in companies:
+        category_name = company["category"]
+        if category_name not in category_ids:
+            result = db.session.execute(insert(Category).values(name=category_name))
+            category_ids[category_name] = result.inserted_primary_key[0]
+
+        batch.append({
+            "name": company["name"],
+            "link": company.get("link", None),
+            "indeed": company.get("indeed", None),
+            "category_id": category_ids[category_name],
+            "user_id": rng.choice(user_ids),
+        })
+        if len(batch) >= BATCH_SIZE:
+            db.session.execute(insert(Company), batch)
+            company_count += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Company), batch)
+        company_count += len(batch)
 
-        
-    users = [
-        User(name="Ethan", password="password-123$"),
-        User(name="Recruiter", password="password-123$"),
-        User(name="Sara", password="password-123$"),
-        User(name="William", password="password-123$"),
+    favorite_company_ids = [
+        company_id for (company_id,) in
+        db.session.query(Company.id).order_by(Company.id).limit(FAVORITES_PER_USER)
     ]
+    favorites = [
+        {"user_id": user_id, "company_id": company_id}
+        for user_id in user_ids for company_id in favorite_company_ids
+    ]
+    if favorites:
+        db.session.execute(insert(Favorites), favorites)
 
-    for user in users:
-        db.session.add(user)
-    
     db.session.commit()
+    return company_count, len(category_ids), len(user_ids)
 
-    
-    for company in companies_data:
-        category_name = company["category"]
-        category = Category.query.filter_by(name=category_name).first()
-
-        if not category:
-            print(f"Category '{category_name}' not found. Skipping company '{company['name']}'.")
-            continue
 
-        
-        import random
-        user = random.choice(User.query.all())
+def main():
+    parser = argparse.ArgumentParser(description="Seed the database.")
+    parser.add_argument("--file", default="companies.json", help="JSON array of companies to load")
+    parser.add_argument("--synthetic", type=int, metavar="N",
+                        help="generate N fake companies instead of reading --file")
+    parser.add_argument("--users", type=int, default=0, metavar="N",
+                        help="number of extra fake users to create")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed for fake companies and company owners")
+    args = parser.parse_args()
 
+    if args.synthetic is not None:
+        companies = synthetic_companies(args.synthetic, seed=args.seed)
+    else:
+        companies = iter_json_array(args.file)
+    user_names = SEED_USERS + synthetic_user_names(args.users)
 
-        new_company = Company(
-            name=company["name"],
-            link=company.get("link", None),
-            indeed=company.get("indeed", None),
-            category_id=category.id,
-            user_id=user.id
-        )
-        db.session.add(new_company)
+    app = create_app()
+    with app.app_context():
+        company_count, category_count, user_count = seed(companies, user_names, random_seed=args.seed)
 
-    db.session.commit()
-
-    
-    for user in users:
-        companies = Company.query.limit(3).all()
-        for company in companies:
-            favorite = Favorites(user_id=user.id, company_id=company.id)
-            db.session.add(favorite)
+    print(f"Database seeded successfully! ({company_count} companies, "
+          f"{category_count} categories, {user_count} users)")
 
-    db.session.commit()
 
-    print("Database seeded successfully!")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# singleflight.py
+
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one in-flight call.
+
+    The first caller for a key runs the function; callers arriving while it is
+    running wait for it and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """``SingleFlight`` for coroutines on one event loop.
+
+    The shared call runs as its own task, so a caller that is cancelled (for
+    example because its client disconnected) does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.coalesced = 0
+
+    async def do(self, key, fn, *args, **kwargs):
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = self._calls[key] = asyncio.ensure_future(fn(*args, **kwargs))
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every caller has gone away.
+            task.exception()
+
+    def in_flight(self):
+        return len(self._calls)
@@ -0,0 +1,234 @@
+# symbols.py
+
+import argparse
+import csv
+import io
+import os
+import re
+import sys
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+# Words that appear in most listing names and carry no signal for fuzzy matching.
+NAME_STOPWORDS = {
+    "inc", "corp", "corporation", "co", "company", "ltd", "limited", "plc", "llc", "lp",
+    "sa", "ag", "nv", "se", "the", "of", "and", "group", "holdings", "holding", "class",
+    "common", "stock", "shares", "ordinary", "new",
+}
+
+_non_word = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text):
+    return _non_word.sub(" ", text.lower()).strip()
+
+
+def _trigrams(text):
+    grams = set()
+    for word in text.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _fuzzy_text(name):
+    words = [word for word in normalize(name).split() if word not in NAME_STOPWORDS]
+    return " ".join(words) or normalize(name)
+
+
+class SymbolIndex:
+    """In-memory ticker index with symbol prefix, name prefix and trigram fuzzy matching.
+
+    Prefix lookups bisect sorted key lists; fuzzy lookups score names sharing
+    trigrams with the query by Dice coefficient and keep those at or above
+    ``min_similarity``.
+    """
+
+    # Fuzzy candidates are gathered from the query's rarest trigrams first; once
+    # this many are found, names reachable only through commoner trigrams are skipped.
+    MAX_FUZZY_CANDIDATES = 500
+
+    def __init__(self, min_similarity=0.5):
+        self.min_similarity = min_similarity
+        self._lock = threading.RLock()
+        self._names = {}
+        self._symbol_keys = []
+        self._name_keys = []
+        self._trigram_postings = {}
+        self._grams = {}
+        # True once a full listing was loaded; symbols learned one at a time through
+        # ``add`` leave it False, so an empty or partial index is not taken as complete.
+        self.listing_loaded = False
+
+    def __len__(self):
+        return len(self._names)
+
+    def load_rows(self, rows):
+        """Replace the index with ``(symbol, name)`` rows."""
+        fresh = SymbolIndex(self.min_similarity)
+        for symbol, name in rows:
+            fresh._add(symbol, name, keep_sorted=False)
+        fresh._symbol_keys.sort()
+        fresh._name_keys.sort()
+        with self._lock:
+            self._names = fresh._names
+            self._symbol_keys = fresh._symbol_keys
+            self._name_keys = fresh._name_keys
+            self._trigram_postings = fresh._trigram_postings
+            self._grams = fresh._grams
+            self.listing_loaded = True
+
+    def load_csv(self, source):
+        """Load an Alpha Vantage ``LISTING_STATUS`` CSV from a path or file object; returns the row count."""
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, newline="", encoding="utf-8") as f:
+                return self.load_csv(f)
+        rows = [
+            (row["symbol"], row["name"])
+            for row in csv.DictReader(source)
+            if row.get("symbol") and row.get("name")
+        ]
+        self.load_rows(rows)
+        return len(rows)
+
+    def add(self, symbol, name):
+        """Add or rename a single symbol, e.g. one learned from a remote search."""
+        with self._lock:
+            self._add(symbol, name, keep_sorted=True)
+
+    def _add(self, symbol, name, keep_sorted):
+        symbol = symbol.strip().upper()
+        name = name.strip()
+        if not symbol or not name:
+            return
+        if symbol in self._names:
+            if self._names[symbol] == name:
+                return
+            self._remove(symbol)
+        self._names[symbol] = name
+
+        keys = [(symbol.lower(), symbol)]
+        normalized = normalize(name)
+        words = normalized.split()
+        name_keys = [(" ".join(words[i:]), i, symbol) for i in range(len(words))]
+        grams = _trigrams(_fuzzy_text(name))
+        if keep_sorted:
+            for key in keys:
+                self._symbol_keys.insert(bisect_left(self._symbol_keys, key), key)
+            for key in name_keys:
+                self._name_keys.insert(bisect_left(self._name_keys, key), key)
+        else:
+            self._symbol_keys.extend(keys)
+            self._name_keys.extend(name_keys)
+        for gram in grams:
+            self._trigram_postings.setdefault(gram, []).append(symbol)
+        self._grams[symbol] = frozenset(grams)
+
+    def _remove(self, symbol):
+        name = self._names.pop(symbol)
+        self._symbol_keys.remove((symbol.lower(), symbol))
+        words = normalize(name).split()
+        for i in range(len(words)):
+            self._name_keys.remove((" ".join(words[i:]), i, symbol))
+        for gram in _trigrams(_fuzzy_text(name)):
+            self._trigram_postings[gram].remove(symbol)
+        del self._grams[symbol]
+
+    def search(self, query, limit=10):
+        """Return up to ``limit`` ``{'symbol', 'name'}`` matches, best first; empty on a miss.
+
+        Ranking: exact symbol, symbol prefix, name prefix, word prefix, then fuzzy name matches.
+        """
+        text = normalize(query)
+        if not text:
+            return []
+        with self._lock:
+            ranked = {}
+
+            def rank(symbol, score):
+                if symbol not in ranked or score < ranked[symbol]:
+                    ranked[symbol] = score
+
+            compact = text.replace(" ", "")
+            for key, symbol in self._prefix(self._symbol_keys, compact, limit):
+                rank(symbol, (0 if key == compact else 1, len(symbol)))
+            for _, position, symbol in self._prefix(self._name_keys, text, limit * 4):
+                rank(symbol, (2 if position == 0 else 3, len(self._names[symbol])))
+            if not ranked:
+                for symbol, similarity in self._fuzzy(text, limit):
+                    rank(symbol, (4, -similarity))
+
+            best = sorted(ranked.items(), key=lambda item: (item[1], item[0]))[:limit]
+            return [{"symbol": symbol, "name": self._names[symbol]} for symbol, _ in best]
+
+    @staticmethod
+    def _prefix(keys, prefix, cap):
+        start = bisect_left(keys, (prefix,))
+        matches = []
+        for entry in keys[start:start + cap]:
+            if not entry[0].startswith(prefix):
+                break
+            matches.append(entry)
+        return matches
+
+    def _fuzzy(self, text, limit):
+        grams = _trigrams(_fuzzy_text(text))
+        postings = sorted(
+            (posting for posting in map(self._trigram_postings.get, grams) if posting), key=len
+        )
+        shared = Counter()
+        for posting in postings:
+            if len(shared) >= self.MAX_FUZZY_CANDIDATES:
+                break
+            shared.update(posting)
+
+        scored = []
+        for symbol, _ in shared.most_common(limit * 5):
+            symbol_grams = self._grams[symbol]
+            similarity = 2 * len(grams & symbol_grams) / (len(grams) + len(symbol_grams))
+            if similarity >= self.min_similarity:
+                scored.append((symbol, similarity))
+        scored.sort(key=lambda item: -item[1])
+        return scored[:limit]
+
+
+def download_listing(client, api_key, path):
+    """Fetch the Alpha Vantage active-listing CSV and atomically replace ``path``; returns its text."""
+    response = client.get(
+        "https://www.alphavantage.co/query",
+        params={"function": "LISTING_STATUS", "apikey": api_key},
+    )
+    response.raise_for_status()
+    text = response.text
+    if not text.startswith("symbol,"):
+        raise ValueError(f"Unexpected LISTING_STATUS response: {text[:200]!r}")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    return text
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    from http_client import alphavantage
+
+    parser = argparse.ArgumentParser(description="Download the symbol listing used by /symbol-search.")
+    parser.add_argument("--path", default=os.getenv("SYMBOL_LISTING_PATH", "symbols.csv"))
+    args = parser.parse_args()
+
+    api_key = os.getenv("ALPHA_VANTAGE_API_KEY")
+    if not api_key:
+        print("ALPHA_VANTAGE_API_KEY is not set", file=sys.stderr)
+        return 1
+    text = download_listing(alphavantage, api_key, args.path)
+    index = SymbolIndex()
+    print(f"Wrote {index.load_csv(io.StringIO(text))} symbols to {args.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
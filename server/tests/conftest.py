@@ -0,0 +1,14 @@
+# conftest.py
+
+import os
+import sys
+import tempfile
+
+# Server modules are imported as top-level modules, as when run from server/.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing app.py needs an OpenAI key and must not create a database or job queue in the tree.
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmp, 'test.db')}")
+os.environ.setdefault("JOBS_PATH", os.path.join(_tmp, "jobs.db"))
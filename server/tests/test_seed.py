@@ -0,0 +1,33 @@
+# test_seed.py
+
+import json
+
+import pytest
+
+from seed import iter_json_array
+
+ITEMS = [1.5, -20, 12345, 3e-07, True, False, None, "a string", {"name": "Acme", "link": "x"}, [1, 2]]
+
+
+def write(tmp_path, text):
+    path = tmp_path / "items.json"
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 64 * 1024])
+def test_scalars_split_across_chunks(tmp_path, chunk_size):
+    path = write(tmp_path, json.dumps(ITEMS))
+    assert list(iter_json_array(path, chunk_size=chunk_size)) == ITEMS
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4])
+def test_whitespace_and_empty_array(tmp_path, chunk_size):
+    assert list(iter_json_array(write(tmp_path, "  [ 1 ,\n 2.25 ]\n"), chunk_size=chunk_size)) == [1, 2.25]
+    assert list(iter_json_array(write(tmp_path, "   []"), chunk_size=chunk_size)) == []
+
+
+@pytest.mark.parametrize("text", ["[1, 2", "[1 2]", "{\"a\": 1}"])
+def test_malformed_arrays_raise(tmp_path, text):
+    with pytest.raises(ValueError):
+        list(iter_json_array(write(tmp_path, text), chunk_size=2))